@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+
+"""A local stand-in for the GitHub v3 API endpoints spoke uses, serving a
+synthetic dataset so benchmarks can run offline and reproducibly
+"""
+
+import BaseHTTPServer
+import SocketServer
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urlparse
+
+#all the synthetic timestamps count from here
+EPOCH = 1340000000
+
+def iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+class Dataset(object):
+    """Synthetic repos for :owner:, and issues, pull requests, commits and
+    comments for the first one, all generated from :seed:
+
+    Repos, issues and comments are generated in a fixed order from a seeded
+    generator, so the same arguments always give the same data.
+    """
+
+    def __init__(self, owner='octo', repos=20, pulls=30, commits=3, issues=50,
+            comments=5, seed=1, base_url='http://127.0.0.1/', git_root=None):
+        rnd = random.Random(seed)
+        self.owner = owner
+        self.base_url = base_url
+        self.git_root = git_root
+        self.repos = [self.repo(owner, 'project-{0:05d}'.format(n), n, rnd)
+            for n in range(repos)]
+        full_name = '{0}/project-{1:05d}'.format(owner, 0)
+        self.issues = {}
+        self.comments = {}
+        self.pulls = {}
+        self.commits = {}
+        for n in range(1, issues + pulls + 1):
+            issue = self.issue(n, n > issues, comments, full_name, rnd)
+            if n > issues:
+                self.pulls[n] = self.pull(issue, commits, full_name)
+                self.commits[n] = [self.commit(n, c) for c in range(commits)]
+            self.issues[n] = issue
+            self.comments[n] = [self.comment(n, c, rnd)
+                for c in range(comments)]
+
+    def user(self, login):
+        return {'login': login, 'id': int(hashlib.sha1(login).hexdigest()[:5], 16),
+            'avatar_url': '', 'gravatar_id': '', 'url': ''}
+
+    def git_url(self, full_name, template):
+        if self.git_root:
+            return 'file://{0}/{1}.git'.format(self.git_root, full_name)
+        return template.format(full_name)
+
+    def repo(self, owner, name, n, rnd):
+        full_name = '{0}/{1}'.format(owner, name)
+        return {
+            'id': 5000 + n,
+            'name': name,
+            'full_name': full_name,
+            'owner': self.user(owner),
+            'description': 'Synthetic repository number {0}'.format(n),
+            'fork': n % 4 == 1,
+            'private': False,
+            'language': rnd.choice(['Python', 'C', 'Go', 'Ruby']),
+            'forks_count': n % 7,
+            'watchers_count': n * 3,
+            'homepage': '',
+            'html_url': 'https://github.com/' + full_name,
+            'ssh_url': self.git_url(full_name, 'git@github.com:{0}.git'),
+            'git_url': self.git_url(full_name, 'git://github.com/{0}.git'),
+            'clone_url': 'https://github.com/{0}.git'.format(full_name),
+            'created_at': iso(EPOCH + n * 86400),
+            'updated_at': iso(EPOCH + n * 86400 + 3600),
+            'pushed_at': iso(EPOCH + n * 86400 + 7200),
+            'permissions': {'admin': True, 'push': True, 'pull': True},
+            'source': {'full_name': '{0}/project-00000'.format(owner),
+                'name': 'project-00000'} if n % 4 == 1 else None,
+        }
+
+    def issue(self, n, is_pull, comments, full_name, rnd):
+        issue = {
+            'id': 1000 + n,
+            'number': n,
+            'state': 'open' if rnd.random() < 0.7 else 'closed',
+            'title': 'Synthetic {0} number {1} about {2}'.format(
+                'pull request' if is_pull else 'issue', n,
+                rnd.choice(['parser', 'network', 'cache', 'docs', 'build'])),
+            'body': ' '.join(rnd.choice(['lorem', 'ipsum', 'dolor', 'sit',
+                'amet', 'spoke', 'github', 'token']) for _ in range(40)),
+            'user': self.user('user{0}'.format(n % 17)),
+            'assignee': self.user('user{0}'.format(n % 5)) if n % 3 else None,
+            'milestone': {'number': 1, 'title': 'v1.0', 'state': 'open'} \
+                if n % 4 == 0 else None,
+            'labels': [{'name': label, 'color': 'ffffff', 'url': ''}
+                for label in (['bug'] if n % 2 else []) + \
+                    (['ui'] if n % 5 == 0 else [])],
+            'comments': comments,
+            'created_at': iso(EPOCH + n * 3600),
+            'updated_at': iso(EPOCH + n * 3600 + 600),
+            'closed_at': None,
+            'html_url': 'https://github.com/{0}/issues/{1}'.format(full_name, n),
+            'url': '{0}repos/{1}/issues/{2}'.format(self.base_url, full_name, n),
+            'pull_request': {'html_url': None, 'diff_url': None,
+                'patch_url': None},
+        }
+        if is_pull:
+            issue['pull_request'] = {'html_url':
+                'https://github.com/{0}/pull/{1}'.format(full_name, n)}
+        return issue
+
+    def pull(self, issue, commits, full_name):
+        (owner, name) = full_name.split('/')
+        login = issue['user']['login']
+        return {
+            'id': issue['id'],
+            'number': issue['number'],
+            'state': issue['state'],
+            'title': issue['title'],
+            'body': issue['body'],
+            'user': issue['user'],
+            'html_url': issue['pull_request']['html_url'],
+            'created_at': issue['created_at'],
+            'updated_at': issue['updated_at'],
+            'closed_at': None,
+            'merged_at': None,
+            'commits': commits,
+            'head': {'label': login + ':topic', 'ref': 'topic',
+                'sha': hashlib.sha1(str(issue['number'])).hexdigest(),
+                'repo': {'full_name': '{0}/{1}'.format(login, name),
+                    'git_url': 'git://github.com/{0}/{1}.git'.format(login,
+                        name)}},
+            'base': {'label': owner + ':master', 'ref': 'master',
+                'sha': hashlib.sha1('base').hexdigest()},
+        }
+
+    def commit(self, number, c):
+        return {'sha': hashlib.sha1('{0}-{1}'.format(number, c)).hexdigest(),
+            'commit': {'message': 'Commit {0}'.format(c)}, 'url': ''}
+
+    def comment(self, number, c, rnd):
+        return {
+            'id': number * 1000 + c,
+            'body': 'Comment {0} on #{1}: {2}'.format(c, number, ' '.join(
+                rnd.choice(['looks', 'good', 'to', 'me', 'needs', 'work',
+                    'rebase', 'please']) for _ in range(25))),
+            'user': self.user('user{0}'.format(c % 11)),
+            'created_at': iso(EPOCH + number * 3600 + c * 60),
+            'updated_at': iso(EPOCH + number * 3600 + c * 60),
+            'url': '',
+        }
+
+class FakeHub(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Serves :dataset: like the GitHub API would, after sleeping :latency:
+    seconds per request, with pages of at most :max_per_page: items and a
+    rate limit of :rate_limit: requests per :rate_window: seconds
+
+    Counts of what it's served are available from /_stats.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, dataset=None, latency=0.0, max_per_page=100,
+            rate_limit=5000, rate_window=3600):
+        BaseHTTPServer.HTTPServer.__init__(self, address, Handler)
+        self.dataset = dataset
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.window_start = time.time()
+        self.used = 0
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(('requests', 'not_modified', 'bytes',
+            'rate_limited'), 0)
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}/'.format(*self.server_address)
+
+    def take(self):
+        """Use up one request of the rate limit, returning whether that was
+        allowed and the remaining and reset values to report
+        """
+        with self.lock:
+            now = time.time()
+            if now >= self.window_start + self.rate_window:
+                self.window_start = now
+                self.used = 0
+            reset = int(self.window_start + self.rate_window) + 1
+            if self.used >= self.rate_limit:
+                self.stats['rate_limited'] += 1
+                return (False, 0, reset)
+            self.used += 1
+            return (True, self.rate_limit - self.used, reset)
+
+    def count(self, stat, n=1):
+        with self.lock:
+            self.stats[stat] += n
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    ROUTES = [(re.compile(pattern), name) for (pattern, name) in [
+        (r'^/users/(?P<user>[^/]+)/repos$', 'user_repos'),
+        (r'^/user/repos$', 'user_repos'),
+        (r'^/orgs/(?P<user>[^/]+)/repos$', 'user_repos'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)$', 'repo'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/forks$', 'forks'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/pulls$', 'pulls'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)$', 'pull'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)/commits$', 'pull_commits'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/issues$', 'issues'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/issues/(?P<number>\d+)$', 'issue'),
+        (r'^/repos/(?P<user>[^/]+)/(?P<repo>[^/]+)/issues/(?P<number>\d+)/comments$', 'comments'),
+        (r'^/_stats$', 'stats'),
+    ]]
+
+    def log_message(self, *pargs):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, verb):
+        url = urlparse.urlparse(self.path)
+        query = dict((k, v[-1]) for (k, v) in urlparse.parse_qs(url.query).items())
+        for (pattern, name) in self.ROUTES:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            if name != 'stats':
+                self.server.count('requests')
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                (allowed, self.remaining, self.reset) = self.server.take()
+                if not allowed:
+                    return self.send_json({'message': 'API rate limit exceeded'},
+                        status=403)
+            try:
+                return getattr(self, 'route_' + name)(verb, query,
+                    **match.groupdict())
+            except KeyError:
+                break
+        self.send_json({'message': 'Not Found'}, status=404)
+
+    def send_json(self, obj, status=200, headers=None):
+        body = json.dumps(obj)
+        etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.server.count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.server.count('bytes', len(body))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('X-RateLimit-Limit', str(self.server.rate_limit))
+        self.send_header('X-RateLimit-Remaining',
+            str(getattr(self, 'remaining', self.server.rate_limit)))
+        self.send_header('X-RateLimit-Reset',
+            str(getattr(self, 'reset', int(time.time()) + 3600)))
+        for (name, value) in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_page(self, items, query):
+        per_page = min(int(query.get('per_page', 30)), self.server.max_per_page)
+        page = int(query.get('page', 1))
+        pages = max(1, (len(items) + per_page - 1) // per_page)
+        base = self.server.url.rstrip('/') + self.path.split('?')[0]
+        def link(number, rel):
+            params = dict(query, page=number, per_page=per_page)
+            return '<{0}?{1}>; rel="{2}"'.format(base, '&'.join(
+                '{0}={1}'.format(k, v) for (k, v) in sorted(params.items())),
+                rel)
+        links = []
+        if page < pages:
+            links.extend([link(page + 1, 'next'), link(pages, 'last')])
+        if page > 1:
+            links.extend([link(1, 'first'), link(page - 1, 'prev')])
+        self.send_json(items[(page - 1) * per_page:page * per_page],
+            headers={'Link': ', '.join(links)} if links else None)
+
+    def find_repo(self, user, repo):
+        for gh_repo in self.server.dataset.repos:
+            if gh_repo['name'] == repo:
+                return dict(gh_repo, owner=self.server.dataset.user(user),
+                    full_name='{0}/{1}'.format(user, repo))
+        raise KeyError(repo)
+
+    def route_stats(self, verb, query):
+        self.send_json(self.server.stats)
+
+    def route_user_repos(self, verb, query, user=None):
+        self.send_page(self.server.dataset.repos, query)
+
+    def route_repo(self, verb, query, user, repo):
+        self.send_json(self.find_repo(user, repo))
+
+    def route_forks(self, verb, query, user, repo):
+        gh_repo = self.find_repo(user, repo)
+        if verb == 'POST':
+            return self.send_json(gh_repo, status=202)
+        self.send_page([gh_repo], query)
+
+    def route_pulls(self, verb, query, user, repo):
+        state = query.get('state', 'open')
+        self.send_page([pull for (_, pull) in
+            sorted(self.server.dataset.pulls.items())
+            if state == 'all' or pull['state'] == state], query)
+
+    def route_pull(self, verb, query, user, repo, number):
+        self.send_json(self.server.dataset.pulls[int(number)])
+
+    def route_pull_commits(self, verb, query, user, repo, number):
+        self.send_page(self.server.dataset.commits[int(number)], query)
+
+    def route_issues(self, verb, query, user, repo):
+        #every repo has the same issues, but missing repos are still a 404
+        self.find_repo(user, repo)
+        state = query.get('state', 'open')
+        since = query.get('since')
+        issues = [issue for (_, issue) in
+            sorted(self.server.dataset.issues.items())
+            if (state == 'all' or issue['state'] == state) and
+                (since is None or issue['updated_at'] >= since)]
+        if query.get('sort') == 'updated':
+            issues.sort(key=lambda issue: issue['updated_at'],
+                reverse=query.get('direction', 'desc') == 'desc')
+        self.send_page(issues, query)
+
+    def route_issue(self, verb, query, user, repo, number):
+        self.send_json(self.server.dataset.issues[int(number)])
+
+    def route_comments(self, verb, query, user, repo, number):
+        self.send_page(self.server.dataset.comments[int(number)], query)
+
+def serve(host='127.0.0.1', port=0, latency=0.0, max_per_page=100,
+        rate_limit=5000, rate_window=3600, **dataset_args):
+    """Start a FakeHub in a background thread, with a Dataset made from
+    :dataset_args:
+    """
+    server = FakeHub((host, port), latency=latency, max_per_page=max_per_page,
+        rate_limit=rate_limit, rate_window=rate_window)
+    server.dataset = Dataset(base_url=server.url, **dataset_args)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def add_dataset_args(parser):
+    parser.add_argument('--repos', type=int, default=20,
+        help='Number of repos')
+    parser.add_argument('--issues', type=int, default=50,
+        help='Number of issues in the first repo')
+    parser.add_argument('--pulls', type=int, default=30,
+        help='Number of pull requests in the first repo')
+    parser.add_argument('--commits', type=int, default=3,
+        help='Number of commits in each pull request')
+    parser.add_argument('--comments', type=int, default=5,
+        help='Number of comments on each issue')
+    parser.add_argument('--seed', type=int, default=1,
+        help='Seed for generating the data')
+    parser.add_argument('--latency', type=float, default=0.0,
+        help='Seconds to wait before answering each request')
+    parser.add_argument('--max-per-page', type=int, default=100,
+        help='Most items to return in one page')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate-limit', type=int, default=5000,
+        help='Requests allowed per rate limit window')
+    parser.add_argument('--rate-window', type=int, default=3600,
+        help='Length of the rate limit window in seconds')
+    parser.add_argument('--git-root', default=None,
+        help='Directory of <owner>/<repo>.git repos to use as clone urls')
+    add_dataset_args(parser)
+    args = parser.parse_args()
+    server = serve(port=args.port, latency=args.latency,
+        max_per_page=args.max_per_page, rate_limit=args.rate_limit,
+        rate_window=args.rate_window, repos=args.repos, issues=args.issues,
+        pulls=args.pulls, commits=args.commits, comments=args.comments,
+        seed=args.seed, git_root=args.git_root)
+    print 'fakehub listening on {0}'.format(server.url)
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
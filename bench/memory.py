@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""Measure spoke's peak memory on large listings, optionally next to an
+older revision of spoke.py for before and after numbers
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from run import Runner, Server, SPOKE
+
+#name, command and the dataset argument that sets how many rows it lists
+CASES = [
+    ('repos-list', ['repos-list'], 'repos'),
+    ('repos-list ndjson', ['--format', 'ndjson', 'repos-list'], 'repos'),
+    ('pr-list', ['pr-list'], 'pulls'),
+    ('pr-list ndjson', ['--format', 'ndjson', 'pr-list'], 'pulls'),
+]
+
+def get_revision(rev):
+    """Write out spoke.py as of git revision :rev:, returning its path
+    """
+    source = subprocess.check_output(['git', 'show',
+        '{0}:spoke.py'.format(rev)], cwd=os.path.dirname(SPOKE))
+    (handle, path) = tempfile.mkstemp(prefix='spoke-', suffix='.py')
+    with os.fdopen(handle, 'w') as f:
+        f.write(source)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=1,
+        help='Number of times to run each case')
+    parser.add_argument('--python', default=sys.executable,
+        help='Interpreter to run spoke with')
+    parser.add_argument('--before', default=None, metavar='REV',
+        help='Also measure spoke.py from this git revision')
+    parser.add_argument('--repos', type=int, default=10000,
+        help='Number of repos for repos-list')
+    parser.add_argument('--pulls', type=int, default=1000,
+        help='Number of pull requests for pr-list (each one also costs a ' \
+            'request for its commits)')
+    args = parser.parse_args()
+
+    server = Server(rate_limit=sys.maxint, repos=args.repos, issues=0,
+        pulls=args.pulls, commits=1, comments=0)
+    versions = [('after' if args.before else 'peak', SPOKE)]
+    if args.before:
+        versions.insert(0, ('before', get_revision(args.before)))
+    runners = [Runner(args.python, server, 'octo', 'project-00000', spoke)
+        for (_, spoke) in versions]
+    header = '{0: <20} {1: >6}'.format('case', 'rows')
+    for (label, _) in versions:
+        header += ' {0: >10} {1: >7}'.format(label + ' MB', 'seconds')
+    if args.before:
+        header += '  change'
+    print header
+    try:
+        for (name, argv, rows) in CASES:
+            results = [runner.measure([], argv, args.runs)
+                for runner in runners]
+            line = '{0: <20} {1: >6}'.format(name, getattr(args, rows))
+            for result in results:
+                line += ' {0: >10.1f} {1: >7.1f}'.format(
+                    result['maxrss_kb'] / 1024.0, result['seconds'])
+            if args.before:
+                line += '  {0:+.0%}'.format(float(results[1]['maxrss_kb']) /
+                    results[0]['maxrss_kb'] - 1)
+            print line
+            sys.stdout.flush()
+    finally:
+        for runner in runners:
+            runner.close()
+        server.shutdown()
+        if args.before:
+            os.remove(versions[0][1])
+
+if __name__ == '__main__':
+    main()
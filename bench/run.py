@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+"""Benchmark spoke's commands against a local fake GitHub API, and compare
+their wall time, API requests and peak memory against a stored baseline
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import pty
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import termios
+import time
+import urllib2
+
+import fakehub
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SPOKE = os.path.join(os.path.dirname(BENCH_DIR), 'spoke.py')
+FAKEHUB = os.path.join(BENCH_DIR, 'fakehub.py')
+BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+#name, commands to run first (unmeasured) and the measured command; each run
+#starts with an empty cache dir so "warm" cases warm it up themselves
+CASES = [
+    ('repos-list', [], ['repos-list']),
+    ('repos-list warm', [['repos-list']], ['repos-list']),
+    ('pr-list', [], ['pr-list']),
+    ('pr-list warm', [['pr-list']], ['pr-list']),
+    ('pr-show', [], ['pr-show', '{first_pull}']),
+    ('issues-list', [], ['issues-list']),
+    ('issues-list warm', [['issues-list']], ['issues-list']),
+    ('issues-show', [], ['issues-show', '1']),
+    ('issues-show warm', [['issues-show', '1']], ['issues-show', '1']),
+    ('index-sync', [], ['index-sync']),
+    ('index-sync incremental', [['index-sync']], ['index-sync']),
+    ('issues-search', [['index-sync']], ['issues-search', 'lorem']),
+    ('dashboard', [], ['dashboard']),
+    ('dashboard warm', [['dashboard']], ['dashboard']),
+]
+
+#spoke looks at the size of the terminal on stdin, so give it one
+CONSOLE_SIZE = (40, 120)
+
+def open_console(rows, columns):
+    (master, slave) = pty.openpty()
+    fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', rows, columns,
+        0, 0))
+    return (master, slave)
+
+class Server(object):
+    """A fakehub serving the dataset from :options: in its own process, since
+    a child's peak RSS starts out at its parent's and the dataset would count
+    towards spoke's
+    """
+
+    def __init__(self, **options):
+        argv = [sys.executable, FAKEHUB, '--port', '0']
+        for (name, value) in sorted(options.items()):
+            argv.extend(['--' + name.replace('_', '-'), str(value)])
+        self.proc = subprocess.Popen(argv, stdout=subprocess.PIPE,
+            close_fds=True)
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError('fakehub failed to start')
+        self.url = line.split()[-1]
+
+    @property
+    def stats(self):
+        return json.load(urllib2.urlopen(self.url + '_stats'))
+
+    def shutdown(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+class Runner(object):
+    """Runs :spoke: with :python: against :server:, in a scratch home dir
+    with a gitconfig pointing it at the server
+    """
+
+    def __init__(self, python, server, user, repo, spoke=SPOKE):
+        self.python = python
+        self.server = server
+        self.spoke = spoke
+        self.target = ['-u', user, '-r', repo]
+        self.home = tempfile.mkdtemp(prefix='spoke-bench-')
+        with open(os.path.join(self.home, '.gitconfig'), 'w') as handle:
+            handle.write('[hub]\n\tusername = {0}\n\tpassword = bench\n' \
+                '\tapi-url = {1}\n'.format(user, server.url))
+        (self.console, self.stdin) = open_console(*CONSOLE_SIZE)
+
+    def close(self):
+        os.close(self.stdin)
+        os.close(self.console)
+        shutil.rmtree(self.home)
+
+    def run(self, argv, cache_dir):
+        """Run spoke with :argv:, returning its wall time, API requests and
+        peak RSS in KB
+        """
+        env = dict(os.environ, HOME=self.home, XDG_CACHE_HOME=cache_dir,
+            SPOKE_NO_DAEMON='1')
+        requests = self.server.stats['requests']
+        with open(os.devnull, 'w') as devnull:
+            with tempfile.TemporaryFile() as errors:
+                start = time.time()
+                proc = subprocess.Popen([self.python, self.spoke] + argv + \
+                    self.target, stdin=self.stdin, stdout=devnull,
+                    stderr=errors, close_fds=True, cwd=self.home, env=env)
+                (_, status, usage) = os.wait4(proc.pid, 0)
+                elapsed = time.time() - start
+                proc.returncode = os.WEXITSTATUS(status)
+                if status:
+                    errors.seek(0)
+                    raise RuntimeError('{0} failed:\n{1}'.format(
+                        ' '.join(argv), errors.read()))
+        return (elapsed, self.server.stats['requests'] - requests,
+            usage.ru_maxrss)
+
+    def measure(self, setup, argv, runs):
+        """Measure :argv: :runs: times, each time in a fresh cache dir after
+        running the :setup: commands
+        """
+        results = []
+        for _ in range(runs):
+            cache_dir = tempfile.mkdtemp(dir=self.home)
+            try:
+                for setup_argv in setup:
+                    self.run(setup_argv, cache_dir)
+                results.append(self.run(argv, cache_dir))
+            finally:
+                shutil.rmtree(cache_dir)
+        timings = sorted(seconds for (seconds, _, _) in results)
+        return {
+            'seconds': round(timings[len(timings) // 2], 4),
+            'requests': max(requests for (_, requests, _) in results),
+            'maxrss_kb': max(maxrss for (_, _, maxrss) in results),
+        }
+
+def compare(result, baseline, time_tolerance, time_slack, memory_tolerance):
+    """Get the ways :result: is worse than :baseline:, allowing :time_slack:
+    seconds on top of :time_tolerance: for the noise in short runs
+    """
+    regressions = []
+    if result['requests'] > baseline['requests']:
+        regressions.append('{0} more request(s)'.format(
+            result['requests'] - baseline['requests']))
+    if result['seconds'] > baseline['seconds'] * (1 + time_tolerance) + \
+            time_slack:
+        regressions.append('{0:+.0%} time'.format(
+            result['seconds'] / baseline['seconds'] - 1))
+    if result['maxrss_kb'] > baseline['maxrss_kb'] * (1 + memory_tolerance):
+        regressions.append('{0:+.0%} memory'.format(
+            float(result['maxrss_kb']) / baseline['maxrss_kb'] - 1))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5,
+        help='Number of times to run each case')
+    parser.add_argument('--python', default=sys.executable,
+        help='Interpreter to run spoke with')
+    parser.add_argument('--case', action='append', default=[],
+        help='Only run this case, can be given more than once')
+    parser.add_argument('--baseline', default=BASELINE,
+        help='Baseline to compare against')
+    parser.add_argument('--save', action='store_true',
+        help='Save the results as the new baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25,
+        help='Fraction of extra wall time to allow before calling it a regression')
+    parser.add_argument('--time-slack', type=float, default=0.1,
+        help='Seconds of extra wall time to allow on top of the tolerance')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+        help='Fraction of extra peak memory to allow before calling it a regression')
+    fakehub.add_dataset_args(parser)
+    parser.set_defaults(repos=100, issues=200, pulls=100, latency=0.02)
+    args = parser.parse_args()
+
+    dataset = dict((name, getattr(args, name)) for name in ('repos', 'issues',
+        'pulls', 'commits', 'comments', 'seed', 'latency', 'max_per_page'))
+    try:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    except (IOError, ValueError):
+        baseline = {'dataset': None, 'cases': {}}
+    if baseline['dataset'] != dataset:
+        if baseline['cases']:
+            print 'The baseline used a different dataset, not comparing'
+        baseline = {'dataset': dataset, 'cases': {}}
+
+    #spoke waits out rate limits, which would stall the benchmark
+    server = Server(rate_limit=sys.maxint, **dataset)
+    runner = Runner(args.python, server, 'octo', 'project-00000')
+    results = {}
+    regressed = False
+    print '{0: <24} {1: >9} {2: >9} {3: >10}  {4}'.format('case', 'median ms',
+        'requests', 'maxrss MB', 'vs baseline')
+    try:
+        for (name, setup, argv) in CASES:
+            if args.case and name not in args.case:
+                continue
+            argv = [arg.format(first_pull=args.issues + 1) for arg in argv]
+            result = results[name] = runner.measure(setup, argv, args.runs)
+            if name in baseline['cases']:
+                regressions = compare(result, baseline['cases'][name],
+                    args.time_tolerance, args.time_slack,
+                    args.memory_tolerance)
+                regressed = regressed or bool(regressions)
+                verdict = ', '.join(regressions) or '{0:+.0%} time'.format(
+                    result['seconds'] / baseline['cases'][name]['seconds'] - 1)
+            else:
+                verdict = 'new'
+            print '{0: <24} {1: >9.1f} {2: >9} {3: >10.1f}  {4}'.format(name,
+                result['seconds'] * 1000, result['requests'],
+                result['maxrss_kb'] / 1024.0, verdict)
+            sys.stdout.flush()
+    finally:
+        runner.close()
+        server.shutdown()
+
+    if args.save:
+        baseline['dataset'] = dataset
+        baseline['cases'].update(results)
+        with open(args.baseline, 'w') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True,
+                separators=(',', ': '))
+            handle.write('\n')
+        print 'Saved the results to {0}'.format(args.baseline)
+    elif regressed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
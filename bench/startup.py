@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Measure how long spoke takes to start up for commands that never need to
+talk to git or GitHub, like ``git hub -h`` or a mistyped subcommand
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SPOKE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'spoke.py')
+
+CASES = [
+    ('interpreter only', ['-c', 'pass']),
+    ('git hub -h', [SPOKE, '-h']),
+    ('git hub pr-list -h', [SPOKE, 'pr-list', '-h']),
+    ('git hub typo', [SPOKE, 'pr-lsit']),
+]
+
+def time_run(argv):
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.call(argv, stdout=devnull, stderr=devnull)
+        return time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20,
+        help='Number of times to run each case')
+    parser.add_argument('--python', default=sys.executable,
+        help='Interpreter to run spoke with')
+    args = parser.parse_args()
+
+    print '{0: <24} {1: >9} {2: >9} {3: >9}'.format('case', 'min ms',
+        'median ms', 'max ms')
+    for (name, argv) in CASES:
+        timings = sorted(time_run([args.python] + argv) \
+            for _ in range(args.runs))
+        print '{0: <24} {1: >9.1f} {2: >9.1f} {3: >9.1f}'.format(name,
+            timings[0] * 1000, timings[len(timings) // 2] * 1000,
+            timings[-1] * 1000)
+
+if __name__ == '__main__':
+    main()
@@ -19,17 +19,24 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
 import argparse
+import collections
+import contextlib
 import os
 from pprint import pprint
 import functools
-import inspect
+import hashlib
+import json
+import random
+import re
+import shutil
+import struct
 import textwrap
 import tempfile
+import threading
 import time
 import subprocess
-
-import git
-import pygithub3
+import sys
+import urlparse
 
 def guess_type(obj):
     ok_types = [int, str, bool]
@@ -61,9 +68,273 @@ def guess_nargs(obj):
         else:
             return '+'
 
+#lets the daemon use the size of each client's console
+_console = threading.local()
+
+_console_size = None
+
 def get_console_size():
-    with os.popen('stty size', 'r') as p:
-        return map(int, p.read().strip().split())
+    """Get the (rows, columns) of the terminal, read once per process, or of
+    the daemon client's terminal if one is set for this thread
+    """
+    global _console_size
+    size = getattr(_console, 'size', None)
+    if size:
+        return size
+    if _console_size is None:
+        for stream in (sys.stdout, sys.stdin, sys.stderr):
+            _console_size = read_console_size(stream)
+            if _console_size is not None:
+                break
+        else:
+            #not on a terminal, e.g. piped into a file
+            try:
+                _console_size = [int(os.environ.get('LINES', 24)),
+                    int(os.environ.get('COLUMNS', 80))]
+            except ValueError:
+                _console_size = [24, 80]
+    return _console_size
+
+def read_console_size(stream=sys.stdout):
+    """Get the (rows, columns) of the terminal :stream: is attached to,
+    without a subprocess, or None if it isn't one
+    """
+    try:
+        import fcntl
+        import termios
+        size = struct.unpack('hh', fcntl.ioctl(stream.fileno(),
+            termios.TIOCGWINSZ, '1234'))
+    except (ImportError, IOError, ValueError, AttributeError):
+        return None
+    return list(size) if size[1] else None
+
+def imap_pool(func, iterable, workers=1, ordered=True):
+    """Map :func: over :iterable: using up to :workers: threads, yielding the
+    results as soon as each one is ready, in order unless :ordered: is False
+
+    The threads start working as soon as this is called, not when the first
+    result is asked for.
+    """
+    if workers <= 1:
+        return (func(item) for item in iterable)
+    from multiprocessing.pool import ThreadPool
+    #datetime.strptime() imports this on first use, which isn't thread safe
+    import _strptime
+    pool = ThreadPool(workers)
+    try:
+        if ordered:
+            results = pool.imap(func, iterable)
+        else:
+            results = pool.imap_unordered(func, iterable)
+    except Exception:
+        pool.terminate()
+        raise
+    return _drain_pool(pool, results)
+
+def _drain_pool(pool, results):
+    try:
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+
+def iter_pages(result, limit=None):
+    """Yield lists of the resources in a pygithub3 :result: a page at a time,
+    only requesting each page when it's needed and stopping once :limit:
+    resources have been yielded
+
+    Pages are dropped from the result's cache as they're yielded so memory
+    use stays bounded by the page size.
+    """
+    remaining = limit
+    for page in result:
+        items = list(page)
+        result.getter.cache.pop(str(page.page), None)
+        if remaining is not None:
+            items = items[:remaining]
+            remaining -= len(items)
+        if items:
+            yield items
+        if remaining is not None and remaining <= 0:
+            return
+
+def get_dir_size(path):
+    """Total size in bytes of the files under :path:
+    """
+    total = 0
+    for (dirpath, _, filenames) in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+class Span(object):
+    """A timed operation, see Tracer.span()
+    """
+
+    def __init__(self, tracer, kind, name, fields):
+        self.tracer = tracer
+        self.kind = kind
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.thread = threading.current_thread().ident
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.time() - self.start
+        self.tracer.spans.append(self)
+        return False
+
+class NullSpan(object):
+    """Does nothing, as cheaply as possible, for when tracing is off
+    """
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Tracer(object):
+    """Records how long API requests, git commands and other slow operations
+    take, once enabled
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.started = time.time()
+
+    def enable(self):
+        """Start recording spans, including every git command GitPython runs
+        """
+        import git.cmd
+        if self.enabled:
+            return
+        self.enabled = True
+        tracer = self
+        execute = git.cmd.Git.execute
+        def traced_execute(self, command, *pargs, **kwargs):
+            if isinstance(command, (list, tuple)):
+                #just the git subcommand, so they can be grouped
+                name = ' '.join(command[1:2])
+            else:
+                name = command
+            with tracer.span('git', name):
+                return execute(self, command, *pargs, **kwargs)
+        git.cmd.Git.execute = traced_execute
+
+    def span(self, kind, name, **fields):
+        """Get a context manager that records how long its block takes as a
+        :kind: operation called :name:, with extra :fields:
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, kind, name, fields)
+
+    def summarize(self):
+        """Get the total, slowest and count of the spans of each kind and
+        name, slowest first
+        """
+        totals = {}
+        for span in list(self.spans):
+            total = totals.setdefault((span.kind, span.name), {'kind': span.kind,
+                'name': span.name, 'calls': 0, 'total': 0.0, 'max': 0.0,
+                'bytes': 0, 'cache': {}})
+            total['calls'] += 1
+            total['total'] += span.duration
+            total['max'] = max(total['max'], span.duration)
+            total['bytes'] += span.fields.get('bytes', 0)
+            cache = span.fields.get('cache')
+            if cache is not None:
+                total['cache'][cache] = total['cache'].get(cache, 0) + 1
+        return sorted(totals.values(), key=lambda total: -total['total'])
+
+    def format_summary(self):
+        lines = ['{0: >5} {1: >10} {2: >9} {3: >9}  {4}'.format('calls',
+            'total ms', 'max ms', 'bytes', 'operation')]
+        for total in self.summarize():
+            what = '{kind} {name}'.format(**total)
+            if total['cache']:
+                what += ' ({0})'.format(', '.join('{0} {1}'.format(count, cache)
+                    for (cache, count) in sorted(total['cache'].items())))
+            lines.append('{0: >5} {1: >10.1f} {2: >9.1f} {3: >9}  {4}'.format(
+                total['calls'], total['total'] * 1000, total['max'] * 1000,
+                total['bytes'] or '-', what))
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """Write the spans to :path: in the Trace Event Format, which
+        chrome://tracing and Perfetto can open
+        """
+        events = [{'name': span.name, 'cat': span.kind, 'ph': 'X',
+            'ts': int((span.start - self.started) * 1e6),
+            'dur': int(span.duration * 1e6), 'pid': os.getpid(),
+            'tid': span.thread, 'args': span.fields}
+            for span in list(self.spans)]
+        with open(path, 'w') as handle:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, handle)
+
+tracer = Tracer()
+
+def get_endpoint(url):
+    """Get the path of an API :url: with the numbers (of issues, PRs etc.)
+    replaced, so requests to the same endpoint can be grouped together
+    """
+    return re.sub(r'/\d+(?=/|$)', '/:number', urlparse.urlparse(url).path)
+
+class ThreadLocalStream(object):
+    """Stand-in for sys.stdout or sys.stderr that sends each thread's writes
+    wherever that thread redirected them, or to :default:
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    @property
+    def target(self):
+        return getattr(self._local, 'target', None) or self.default
+
+    def redirect(self, target):
+        self._local.target = target
+
+    def write(self, data):
+        self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+class lazy_property(object):
+    """Like a read-only property, but only computed the first time it's
+    accessed on each instance
+    """
+
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.func.__name__] = self.func(obj)
+        return value
 
 class ArgFunc(object):
     @staticmethod
@@ -80,6 +351,22 @@ class ArgFunc(object):
 
     @staticmethod
     def auto_define_args(func):
+        #the signature is only inspected when the command table needs to be
+        #rebuilt, see get_attrs()
+        func._argfunc_attrs = None
+        func._argfunc_source = func
+        return func
+
+    @staticmethod
+    def get_attrs(func):
+        attrs = func._argfunc_attrs
+        if attrs is None:
+            attrs = ArgFunc.inspect_args(func._argfunc_source)
+        return attrs
+
+    @staticmethod
+    def inspect_args(func):
+        import inspect
         (args, pargs, kwargs, defaults) = inspect.getargspec(func)
         if args[0] == 'self' or args[0] == 'cls':
             args = args[1:]
@@ -107,20 +394,22 @@ class ArgFunc(object):
             }
         if kwargs is not None:
             pass
-        func._argfunc_attrs = attrs
-        return func
+        return attrs
 
 
     def add_func(self, parser, func):
         if hasattr(func, '_argfunc_attrs'):
-            for (arg, attrs) in func._argfunc_attrs.iteritems():
-                fixed_attrs = attrs.copy()
-                if 'name' in attrs:
-                    command_name = fixed_attrs.pop('name')
-                    fixed_attrs['dest'] = arg
-                else:
-                    command_name = arg
-                parser.add_argument(command_name, **fixed_attrs)
+            self.add_args(parser, self.get_attrs(func).iteritems())
+
+    def add_args(self, parser, args):
+        for (arg, attrs) in args:
+            fixed_attrs = attrs.copy()
+            if 'name' in attrs:
+                command_name = fixed_attrs.pop('name')
+                fixed_attrs['dest'] = arg
+            else:
+                command_name = arg
+            parser.add_argument(command_name, **fixed_attrs)
 
 
     def add_obj(self, parser, obj):
@@ -128,6 +417,830 @@ class ArgFunc(object):
                 if callable(obj, a) and hasattr(getattr(obj, a), '_argfunc_attrs')):
             self.add_func(parser, func)
 
+def iter_service_clients(github):
+    """Find the pygithub3 client behind each service (and sub-service) of
+    :github:
+    """
+    seen = set()
+    pending = vars(github).values()
+    while pending:
+        service = pending.pop()
+        client = getattr(service, '_client', None)
+        if client is None or id(service) in seen:
+            continue
+        seen.add(id(service))
+        yield client
+        pending.extend(vars(service).values())
+
+def get_cache_dir(*parts):
+    """Get (and create) a directory under the user's cache dir, which is
+    $XDG_CACHE_HOME/spoke or ~/.cache/spoke
+    """
+    base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    path = os.path.join(base, 'spoke', *parts)
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    return path
+
+class ResponseCache(object):
+    """Persistent cache of GitHub API responses
+
+    Bodies are stored alongside their ETag/Last-Modified validators so stale
+    entries can be revalidated with a conditional request instead of being
+    downloaded again. Entries are evicted least-recently-used first once the
+    cache grows past :max_size: bytes.
+    """
+
+    DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+    # (url pattern, seconds an entry is used without revalidating), first match
+    # wins. Anything not listed is always revalidated, which is still cheap
+    # since GitHub doesn't count 304s against the rate limit.
+    TTLS = [
+        (re.compile(r'/pulls/\d+/commits$'), 60),
+        (re.compile(r'/repos/[^/]+/[^/]+$'), 60),
+        (re.compile(r'(/users/[^/]+|/orgs/[^/]+|/user)/repos$'), 60),
+        (re.compile(r'/users/[^/]+$'), 300),
+    ]
+    STORED_HEADERS = ('etag', 'last-modified', 'link', 'content-type')
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.enabled = True
+        #bytes in the cache, counted by walking it on the first put and kept
+        #up to date after that so later puts don't have to
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def key(self, method, url, params=None, headers=None, login=None):
+        params = sorted((str(k), unicode(v)) for (k, v) in (params or {}).items() \
+            if k != 'access_token')
+        accept = (headers or {}).get('Accept', '')
+        raw = json.dumps([method.upper(), url, params, accept, login])
+        return hashlib.sha1(raw).hexdigest()
+
+    def ttl(self, url):
+        path = urlparse.urlparse(url).path.rstrip('/')
+        for (pattern, ttl) in self.TTLS:
+            if pattern.search(path):
+                return ttl
+        return 0
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Get the (meta, body) for :key:, or None if it isn't cached
+        """
+        try:
+            with open(self._entry_path(key), 'rb') as handle:
+                meta = json.loads(handle.readline())
+                body = handle.read()
+        except (IOError, OSError, ValueError):
+            return None
+        return (meta, body)
+
+    def is_fresh(self, meta):
+        return time.time() - meta['stored_at'] < self.ttl(meta['url'])
+
+    def touch(self, key, meta=None, headers=None):
+        """Mark :key: as recently used, optionally recording that it was just
+        revalidated
+        """
+        entry_path = self._entry_path(key)
+        if meta is not None:
+            meta['stored_at'] = time.time()
+            for name in self.STORED_HEADERS:
+                if headers and headers.get(name):
+                    meta['headers'][name] = headers.get(name)
+            (_, body) = self.get(key) or (None, None)
+            if body is not None:
+                self._write(entry_path, meta, body)
+                return
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+
+    def put(self, key, url, response):
+        headers = dict((name, response.headers.get(name)) \
+            for name in self.STORED_HEADERS if response.headers.get(name))
+        if 'etag' not in headers and 'last-modified' not in headers and \
+                not self.ttl(url):
+            #nothing to revalidate with and no ttl, not worth keeping
+            return
+        meta = {'url': url, 'stored_at': time.time(), 'headers': headers}
+        entry_path = self._entry_path(key)
+        if not os.path.isdir(os.path.dirname(entry_path)):
+            try:
+                os.makedirs(os.path.dirname(entry_path))
+            except OSError:
+                pass
+        try:
+            replaced = os.path.getsize(entry_path)
+        except OSError:
+            replaced = 0
+        self._grow(self._write(entry_path, meta, response.content) - replaced)
+
+    def _write(self, entry_path, meta, body):
+        """Write an entry, returning its size
+        """
+        (fd, tmp_path) = tempfile.mkstemp(dir=os.path.dirname(entry_path))
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(json.dumps(meta) + '\n')
+            handle.write(body)
+            size = handle.tell()
+        os.rename(tmp_path, entry_path)
+        return size
+
+    def _grow(self, delta):
+        """Count :delta: more bytes in the cache, evicting entries if that
+        takes it past :max_size:
+        """
+        with self._size_lock:
+            if self._size is not None:
+                self._size += delta
+                if self._size <= self.max_size:
+                    return
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits in
+        :max_size:
+
+        This walks the whole cache, which also corrects the running size for
+        entries other processes have written or evicted.
+        """
+        entries = []
+        total = 0
+        for (dirpath, _, filenames) in os.walk(self.path):
+            for filename in filenames:
+                entry_path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry_path))
+                total += st.st_size
+        self._size = total
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for (_, size, entry_path) in entries:
+            try:
+                os.unlink(entry_path)
+            except OSError:
+                pass
+            total -= size
+            if total <= self.max_size * 0.9:
+                break
+        self._size = total
+
+class CachedResponse(object):
+    """Stand-in for a requests response that was answered from the cache
+    """
+
+    status_code = 200
+    from_cache = True
+    revalidated = False
+
+    def __init__(self, url, meta, body, headers=None):
+        self.url = url
+        self.headers = dict(meta['headers'])
+        for (name, value) in (headers or {}).items():
+            self.headers[name.lower()] = value
+        self.content = body
+
+    def raise_for_status(self):
+        pass
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_size=10, timeout=30, compress=True):
+    """Get the requests session shared by every API call in this process,
+    creating it with the given settings the first time
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            _http_session = requests.session(
+                headers={
+                    'Accept-Encoding': 'gzip, deflate' if compress else 'identity',
+                },
+                timeout=timeout,
+                config={
+                    'keep_alive': True,
+                    'pool_connections': pool_size,
+                    'pool_maxsize': pool_size,
+                })
+        return _http_session
+
+def get_connection_count(session):
+    """Count the connections :session: has opened so far
+    """
+    return sum(getattr(pool, 'num_connections', 0) \
+        for pool in dict.values(session.poolmanager.pools))
+
+class RateLimiter(object):
+    """Schedules API requests around GitHub's rate limit
+
+    The budget is tracked from each response's X-RateLimit-* headers. As it
+    runs low, fewer requests are allowed in flight at once and then requests
+    are spaced out over what's left of the window; once it's exhausted (or a
+    response says to Retry-After) requests pause instead of failing. With a
+    :state_path: the budget is shared with other spoke processes through a
+    small locked file.
+    """
+
+    #below these fractions of the limit, narrow concurrency and then start
+    #spacing requests out until the window resets
+    NARROW_BELOW = 0.2
+    PACE_BELOW = 0.05
+    MAX_RETRIES = 5
+
+    def __init__(self, max_concurrency=8, state_path=None, max_wait=3600,
+            reserve=0):
+        self.max_concurrency = max_concurrency
+        self.state_path = state_path
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.in_flight = 0
+        self._next_send = 0.0
+        self._cond = threading.Condition()
+
+    def call(self, send):
+        """Call :send: to make a request once the budget allows, retrying it
+        if GitHub turns it away for hitting the rate limit
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            self.acquire()
+            response = None
+            try:
+                response = send()
+            finally:
+                self.release(response)
+            delay = self.retry_delay(response)
+            if delay is None or attempt == self.MAX_RETRIES:
+                return response
+            self._pause(delay, 'GitHub rate limited a request')
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self._allowed_in_flight():
+                self._cond.wait()
+            self.in_flight += 1
+            self._share(take=1)
+            delay = self._send_delay(time.time())
+        if delay > 0:
+            self._pause(delay, 'Running low on GitHub API rate limit')
+
+    def release(self, response):
+        with self._cond:
+            self.in_flight -= 1
+            if response is not None:
+                headers = response.headers
+                try:
+                    self.limit = int(headers.get('x-ratelimit-limit'))
+                    self.remaining = int(headers.get('x-ratelimit-remaining'))
+                    self.reset = int(headers.get('x-ratelimit-reset'))
+                except (TypeError, ValueError):
+                    pass
+                else:
+                    self._share()
+            self._cond.notify_all()
+
+    def retry_delay(self, response):
+        """How long to wait before retrying :response:'s request, or None if
+        it wasn't rate limited
+        """
+        if response is None or response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get('retry-after')
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 1)
+            except ValueError:
+                return 60
+        if response.headers.get('x-ratelimit-remaining') == '0' and \
+                self.reset is not None:
+            return max(self.reset - time.time(), 1)
+        return None
+
+    def _allowed_in_flight(self):
+        if not self.limit or self.remaining is None:
+            return self.max_concurrency
+        narrow_below = self.limit * self.NARROW_BELOW
+        if self.remaining >= narrow_below:
+            return self.max_concurrency
+        return max(1, int(self.max_concurrency * self.remaining / narrow_below))
+
+    def _send_delay(self, now):
+        if not self.limit or self.remaining is None or self.reset is None or \
+                self.reset <= now:
+            return 0
+        if self.remaining < self.reserve:
+            return self.reset - now
+        if self.remaining >= self.limit * self.PACE_BELOW:
+            return 0
+        interval = (self.reset - now) / max(self.remaining, 1)
+        delay = max(self._next_send - now, 0)
+        self._next_send = now + delay + interval
+        return delay
+
+    def _pause(self, delay, reason):
+        delay = min(delay, self.max_wait)
+        if delay >= 1:
+            sys.stderr.write('{0}, waiting {1:.0f}s...\n'.format(reason, delay))
+        time.sleep(delay)
+
+    def _share(self, take=0):
+        """Merge our view of the budget with the one in the state file, taking
+        :take: requests from it
+
+        Within a rate limit window the lowest remaining count wins, and a
+        later window replaces an earlier one.
+        """
+        if self.state_path is not None:
+            try:
+                import fcntl
+                with open(self.state_path, 'a+') as handle:
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                    try:
+                        handle.seek(0)
+                        try:
+                            state = json.loads(handle.read() or '{}')
+                        except ValueError:
+                            state = {}
+                        self._merge(state.get('limit'), state.get('remaining'),
+                            state.get('reset'))
+                        if take and self.remaining is not None:
+                            self.remaining -= take
+                        handle.seek(0)
+                        handle.truncate()
+                        handle.write(json.dumps({'limit': self.limit,
+                            'remaining': self.remaining, 'reset': self.reset}))
+                    finally:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+                return
+            except (ImportError, IOError, OSError):
+                pass
+        if take and self.remaining is not None:
+            self.remaining -= take
+
+    def _merge(self, limit, remaining, reset):
+        if remaining is None or reset is None or reset <= time.time():
+            return
+        if self.reset is None or reset > self.reset:
+            (self.limit, self.remaining, self.reset) = (limit, remaining, reset)
+        elif reset == self.reset and remaining < self.remaining:
+            self.remaining = remaining
+
+_rate_limiters = {}
+
+def get_rate_limiter(login, **kwargs):
+    """Get the process-wide :RateLimiter: for :login:'s API budget, creating
+    it with :kwargs: the first time
+    """
+    with _http_session_lock:
+        if login not in _rate_limiters:
+            _rate_limiters[login] = RateLimiter(**kwargs)
+        return _rate_limiters[login]
+
+class CachingRequester(object):
+    """Stands in for the requests session of pygithub3's clients, sending
+    everything through a shared session and answering GETs from a
+    :ResponseCache: where possible
+    """
+
+    def __init__(self, session, cache=None, auth=None, params=None,
+            limiter=None):
+        self._session = session
+        self._cache = cache
+        self._limiter = limiter
+        self.auth = auth
+        self.params = dict(params or {})
+        self.stats = dict.fromkeys(('requests', 'sent', 'cache_hits',
+            'not_modified'), 0)
+        self._stats_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _send(self, method, url, **kwargs):
+        def send():
+            self._count('sent')
+            return self._session.request(method, url, **kwargs)
+        if self._limiter is None:
+            return send()
+        return self._limiter.call(send)
+
+    def request(self, method, url, **kwargs):
+        if not tracer.enabled:
+            return self._request(method, url, **kwargs)
+        with tracer.span('http', '{0} {1}'.format(method.upper(),
+                get_endpoint(url))) as span:
+            response = self._request(method, url, **kwargs)
+            if getattr(response, 'revalidated', False):
+                cache = 'revalidated'
+            elif getattr(response, 'from_cache', False):
+                cache = 'cached'
+            else:
+                cache = 'sent'
+            span.set(status=response.status_code, cache=cache,
+                bytes=len(response.content or ''),
+                page=(kwargs.get('params') or {}).get('page'))
+        return response
+
+    def _request(self, method, url, **kwargs):
+        self._count('requests')
+        params = dict(self.params)
+        params.update(kwargs.get('params') or {})
+        kwargs['params'] = params
+        kwargs.setdefault('auth', self.auth)
+        if method.lower() != 'get' or self._cache is None or \
+                not self._cache.enabled:
+            return self._send(method, url, **kwargs)
+        headers = dict(kwargs.get('headers') or {})
+        login = (self.auth or (None,))[0]
+        key = self._cache.key(method, url, params, headers, login)
+        entry = self._cache.get(key)
+        if entry is not None:
+            (meta, body) = entry
+            if self._cache.is_fresh(meta):
+                self._cache.touch(key)
+                self._count('cache_hits')
+                return CachedResponse(url, meta, body)
+            if 'etag' in meta['headers']:
+                headers['If-None-Match'] = meta['headers']['etag']
+            if 'last-modified' in meta['headers']:
+                headers['If-Modified-Since'] = meta['headers']['last-modified']
+            kwargs['headers'] = headers
+        response = self._send(method, url, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            #reading the (empty) body puts the connection back in the pool
+            response.content
+            self._count('not_modified')
+            self._cache.touch(key, meta, response.headers)
+            response = CachedResponse(url, meta, body,
+                dict((k, v) for (k, v) in response.headers.items() \
+                    if k.lower().startswith('x-ratelimit')))
+            response.revalidated = True
+            return response
+        elif response.status_code == 200:
+            self._cache.put(key, url, response)
+        return response
+
+def format_timestamp(value):
+    """Normalize a GitHub timestamp (a datetime from pygithub3 or an ISO 8601
+    string) to an ISO 8601 string
+    """
+    if value is None or isinstance(value, basestring):
+        return value
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def json_default(obj):
+    """json.dumps() fallback for pygithub3 resources and dates
+    """
+    if hasattr(obj, '_attrs'):
+        return obj._attrs
+    elif hasattr(obj, 'strftime'):
+        return format_timestamp(obj)
+    raise TypeError(repr(obj))
+
+def as_record(obj, **fields):
+    """Get :obj: (a pygithub3 resource, sqlite row or dict) as a plain dict
+    for the json output formats, with :fields: added
+    """
+    if hasattr(obj, '_attrs'):
+        record = dict(obj._attrs)
+    else:
+        record = dict(obj)
+    record.update(fields)
+    return record
+
+def get_field(obj, name, default=None):
+    """Get :name: from an API object, whether it's a pygithub3 resource or a
+    plain dict
+    """
+    if obj is None:
+        return default
+    elif isinstance(obj, dict):
+        return obj.get(name, default)
+    else:
+        return getattr(obj, name, default)
+
+class RecordLoader(object):
+    """Stand-in for a pygithub3 resource class that decodes each page of a
+    listing into :row_type: rows, or the plain dicts from the JSON if it's
+    None, instead of building resource objects
+    """
+
+    def __init__(self, row_type=None):
+        self.row_type = row_type
+
+    def loads(self, content):
+        items = json.loads(content)
+        if self.row_type is None:
+            return items
+        return [self.row_type.from_api(item) for item in items]
+
+class RepoRow(collections.namedtuple('RepoRow', 'name fork description')):
+    """The fields of a repo that repos-list shows
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_api(cls, item):
+        return cls(item['name'], item['fork'], item.get('description'))
+
+class PullRow(collections.namedtuple('PullRow', 'number title user html_url')):
+    """The fields of a pull request that pr-list shows
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_api(cls, item):
+        return cls(item['number'], item['title'], item['user']['login'],
+            item['html_url'])
+
+class IssueRow(collections.namedtuple('IssueRow',
+        'number title user updated_at is_pull')):
+    """The fields of an issue (or pull request) that dashboard shows
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_api(cls, item):
+        return cls(item['number'], item['title'], item['user']['login'],
+            item['updated_at'], bool(get_field(item.get('pull_request'),
+                'html_url')))
+
+    @classmethod
+    def from_index(cls, row):
+        return cls(row['number'], row['title'], row['user'],
+            row['updated_at'], bool(row['is_pull']))
+
+def get_index_path():
+    return os.path.join(get_cache_dir(), 'index.sqlite')
+
+class IssueIndex(object):
+    """Local SQLite mirror of repos' issues, pull requests and their comments
+
+    Repos are identified by their "owner/name" full name so a single database
+    can hold any number of them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS issues (
+            repo        TEXT NOT NULL,
+            number      INTEGER NOT NULL,
+            is_pull     INTEGER NOT NULL DEFAULT 0,
+            state       TEXT,
+            title       TEXT,
+            body        TEXT,
+            user        TEXT,
+            assignee    TEXT,
+            milestone   TEXT,
+            labels      TEXT,
+            comments    INTEGER,
+            html_url    TEXT,
+            created_at  TEXT,
+            updated_at  TEXT,
+            closed_at   TEXT,
+            PRIMARY KEY (repo, number)
+        );
+        CREATE INDEX IF NOT EXISTS issues_by_state
+            ON issues (repo, is_pull, state);
+        CREATE TABLE IF NOT EXISTS pulls (
+            repo        TEXT NOT NULL,
+            number      INTEGER NOT NULL,
+            commits     INTEGER,
+            html_url    TEXT,
+            data        TEXT,
+            PRIMARY KEY (repo, number)
+        );
+        CREATE TABLE IF NOT EXISTS comments (
+            repo        TEXT NOT NULL,
+            id          INTEGER NOT NULL,
+            number      INTEGER NOT NULL,
+            user        TEXT,
+            body        TEXT,
+            created_at  TEXT,
+            updated_at  TEXT,
+            PRIMARY KEY (repo, id)
+        );
+        CREATE INDEX IF NOT EXISTS comments_by_issue
+            ON comments (repo, number, created_at);
+        CREATE TABLE IF NOT EXISTS sync_state (
+            repo        TEXT PRIMARY KEY,
+            watermark   TEXT,
+            synced_at   REAL
+        );
+        CREATE TABLE IF NOT EXISTS search_docs (
+            docid       INTEGER PRIMARY KEY,
+            repo        TEXT NOT NULL,
+            number      INTEGER NOT NULL,
+            UNIQUE (repo, number)
+        );
+    """
+    SEARCH_SCHEMA = """
+        CREATE VIRTUAL TABLE search USING fts4 (title, body, comments);
+    """
+    #relative weight of a match in each of the search table's columns
+    SEARCH_WEIGHTS = (4.0, 1.0, 0.5)
+    SORT_COLUMNS = {
+        'created': 'created_at',
+        'updated': 'updated_at',
+        'comments': 'comments',
+    }
+
+    def __init__(self, path):
+        import sqlite3
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(self.SCHEMA)
+        self._db.create_function('search_rank', 1, self._search_rank)
+        if self._db.execute('SELECT 1 FROM sqlite_master WHERE ' \
+                'name = \'search\'').fetchone() is None:
+            self._db.executescript(self.SEARCH_SCHEMA)
+            self.rebuild_search()
+
+    def commit(self):
+        self._db.commit()
+
+    def get_watermark(self, repo):
+        row = self._db.execute('SELECT watermark FROM sync_state WHERE repo = ?',
+            (repo,)).fetchone()
+        return row['watermark'] if row is not None else None
+
+    def set_watermark(self, repo, watermark):
+        self._db.execute('INSERT OR REPLACE INTO sync_state ' \
+            '(repo, watermark, synced_at) VALUES (?, ?, ?)',
+            (repo, watermark, time.time()))
+
+    def add_issue(self, repo, issue):
+        self.add_issues(repo, [issue])
+
+    def add_issues(self, repo, issues):
+        self._db.executemany('INSERT OR REPLACE INTO issues VALUES ' \
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._issue_row(repo, issue) for issue in issues))
+
+    @classmethod
+    def _issue_row(cls, repo, issue):
+        milestone = get_field(issue, 'milestone')
+        labels = [get_field(l, 'name') for l in get_field(issue, 'labels', [])]
+        return (
+            repo,
+            get_field(issue, 'number'),
+            int(bool(get_field(get_field(issue, 'pull_request'), 'html_url'))),
+            get_field(issue, 'state'),
+            get_field(issue, 'title'),
+            get_field(issue, 'body'),
+            get_field(get_field(issue, 'user'), 'login'),
+            get_field(get_field(issue, 'assignee'), 'login'),
+            get_field(milestone, 'title'),
+            ',' + ','.join(labels) + ',' if labels else None,
+            get_field(issue, 'comments'),
+            get_field(issue, 'html_url'),
+            format_timestamp(get_field(issue, 'created_at')),
+            format_timestamp(get_field(issue, 'updated_at')),
+            format_timestamp(get_field(issue, 'closed_at')),
+        )
+
+    def add_pull(self, repo, pull):
+        data = pull._attrs if hasattr(pull, '_attrs') else pull
+        self._db.execute('INSERT OR REPLACE INTO pulls VALUES (?, ?, ?, ?, ?)', (
+            repo,
+            get_field(pull, 'number'),
+            get_field(pull, 'commits'),
+            get_field(pull, 'html_url'),
+            json.dumps(data, default=json_default),
+        ))
+
+    def set_comments(self, repo, number, comments):
+        self._db.execute('DELETE FROM comments WHERE repo = ? AND number = ?',
+            (repo, number))
+        self._db.executemany('INSERT OR REPLACE INTO comments VALUES ' \
+            '(?, ?, ?, ?, ?, ?, ?)', ((
+                repo,
+                get_field(comment, 'id'),
+                number,
+                get_field(get_field(comment, 'user'), 'login'),
+                get_field(comment, 'body'),
+                format_timestamp(get_field(comment, 'created_at')),
+                format_timestamp(get_field(comment, 'updated_at')),
+            ) for comment in comments))
+
+    def update_search(self, repo, number):
+        """Refresh the full text search entry for an issue from its indexed
+        title, body and comments
+        """
+        issue = self.get_issue(repo, number)
+        if issue is None:
+            return
+        self._db.execute('INSERT OR IGNORE INTO search_docs (repo, number) ' \
+            'VALUES (?, ?)', (repo, number))
+        docid = self._db.execute('SELECT docid FROM search_docs WHERE ' \
+            'repo = ? AND number = ?', (repo, number)).fetchone()['docid']
+        comments = '\n'.join(c['body'] or '' for c in self.get_comments(repo, number))
+        self._db.execute('DELETE FROM search WHERE docid = ?', (docid,))
+        self._db.execute('INSERT INTO search (docid, title, body, comments) ' \
+            'VALUES (?, ?, ?, ?)', (docid, issue['title'], issue['body'], comments))
+
+    def rebuild_search(self):
+        for row in self._db.execute('SELECT repo, number FROM issues').fetchall():
+            self.update_search(row['repo'], row['number'])
+        self.commit()
+
+    @classmethod
+    def _search_rank(cls, matchinfo):
+        """Score a match from its matchinfo(search, 'pcx'), weighting each
+        phrase hit by how rare it is across all issues
+        """
+        info = struct.unpack('@{0}I'.format(len(matchinfo) // 4), str(matchinfo))
+        (phrases, columns) = info[:2]
+        score = 0.0
+        for phrase in range(phrases):
+            for column in range(columns):
+                offset = 2 + 3 * (phrase * columns + column)
+                (hits, all_hits) = info[offset:offset + 2]
+                if hits:
+                    score += cls.SEARCH_WEIGHTS[column] * hits / float(all_hits)
+        return score
+
+    def search(self, query, repo=None, limit=20):
+        """Find the issues best matching the full text search :query:, in
+        :repo: or in every indexed repo
+        """
+        where = 'search MATCH ?'
+        params = [query]
+        if repo is not None:
+            where += ' AND d.repo = ?'
+            params.append(repo)
+        params.append(limit)
+        return self._db.execute('SELECT i.*, search_rank(matchinfo(search, ' \
+            '\'pcx\')) AS rank, snippet(search, \'[\', \']\', \'...\', -1, 12) ' \
+            'AS snippet FROM search JOIN search_docs d ON d.docid = search.docid ' \
+            'JOIN issues i ON i.repo = d.repo AND i.number = d.number ' \
+            'WHERE {0} ORDER BY rank DESC LIMIT ?'.format(where), params)
+
+    def get_issue(self, repo, number):
+        return self._db.execute('SELECT * FROM issues WHERE repo = ? AND number = ?',
+            (repo, number)).fetchone()
+
+    def get_comments(self, repo, number):
+        return self._db.execute('SELECT * FROM comments WHERE repo = ? AND ' \
+            'number = ? ORDER BY created_at, id', (repo, number)).fetchall()
+
+    def get_pull(self, repo, number):
+        row = self._db.execute('SELECT * FROM pulls WHERE repo = ? AND number = ?',
+            (repo, number)).fetchone()
+        return json.loads(row['data']) if row is not None else None
+
+    def list_issues(self, repo, state='open', assignee='*', milestone='*',
+            labels='', sort='created', direction='desc', pulls=None):
+        """Query the indexed issues of :repo:, using the same filter values as
+        the GitHub issues API ('none' and '*' for assignee and milestone, comma
+        separated labels that must all match)
+        """
+        where = ['i.repo = ?']
+        params = [repo]
+        if state != 'all':
+            where.append('i.state = ?')
+            params.append(state)
+        for (column, value) in (('assignee', assignee), ('milestone', milestone)):
+            if value == 'none':
+                where.append('i.{0} IS NULL'.format(column))
+            elif value != '*':
+                where.append('i.{0} = ?'.format(column))
+                params.append(value)
+        for label in (l.strip() for l in labels.split(',') if l.strip()):
+            where.append('i.labels LIKE ?')
+            params.append('%,{0},%'.format(label))
+        if pulls is not None:
+            where.append('i.is_pull = ?')
+            params.append(int(pulls))
+        return self._db.execute('SELECT i.*, p.commits AS commits, ' \
+            'p.html_url AS pull_url FROM issues i LEFT JOIN pulls p ' \
+            'ON p.repo = i.repo AND p.number = i.number WHERE {0} ' \
+            'ORDER BY i.{1} {2}, i.number {2}'.format(' AND '.join(where),
+                self.SORT_COLUMNS.get(sort, 'created_at'),
+                'ASC' if direction == 'asc' else 'DESC'), params)
+
 class GithubActor(object):
     """
     """
@@ -135,39 +1248,210 @@ class GithubActor(object):
     CONFIG_NS       = 'hub'
     GIT_REMOTE_NAME = 'github'
     FALLBACK_EDITOR = 'nano'
-
-    _current_repo   = None
-    _current_user   = None
-    _github         = None
-
-    def __init__(self, output=None):
-        self._current_repo = self._init_repo()
-        creds = self._get_github_credentials(self._current_repo)
-        self._current_user = creds[0]
-        self._github = self._init_github(creds[0], creds[1], self._current_repo)
+    DEFAULT_WORKERS = 8
+    FORK_TIMEOUT    = 120
+    IDLE_TIMEOUT    = 600
+    OUTPUT_FORMATS  = ('text', 'json', 'ndjson')
+    MIRROR_STATE    = '.spoke-mirror.json'
+
+    def __init__(self, output=None, use_cache=True, output_format='text',
+            cwd=None):
+        self._use_cache = use_cache
+        self._format = output_format
+        self._cwd = cwd
+        #per thread state, so batch can run commands concurrently
+        self._local = threading.local()
         if output is not None:
             self._output = output
 
+    @lazy_property
+    def _current_repo(self):
+        return self._init_repo()
+
+    @lazy_property
+    def _credentials(self):
+        return self._get_github_credentials(self._current_repo)
+
+    @lazy_property
+    def _current_user(self):
+        return self._credentials[0]
+
+    @lazy_property
+    def _response_cache(self):
+        if not self._use_cache:
+            return None
+        return self._init_response_cache(self._current_repo)
+
+    @lazy_property
+    def _github(self):
+        (username, password) = self._credentials
+        return self._init_github(username, password, self._current_repo)
+
+    @property
+    def _index(self):
+        #sqlite connections can't be shared between threads
+        index = getattr(self._local, 'index', None)
+        if index is None:
+            index = self._local.index = IssueIndex(get_index_path())
+        return index
+
     def _output(self, obj, *pargs, **kwargs):
+        #in the json formats stdout is only for records
+        stream = sys.stdout if self._format == 'text' else sys.stderr
         if issubclass(obj.__class__, basestring):
-            print unicode(obj).format(*pargs, **kwargs)
+            print >>stream, unicode(obj).format(*pargs, **kwargs)
         else:
             try:
-                pprint(obj, indent=2)
+                pprint(obj, stream, indent=2)
             except Exception:
-                print repr(obj)
+                print >>stream, repr(obj)
 
-    def _init_repo(self):
+    def _output_record(self, record, template=None, *pargs, **kwargs):
+        """Output a command's result: :record: serialized in the json
+        formats, otherwise :template: formatted like _output() does (or
+        :record: itself if there's no template)
+        """
+        if self._format == 'text':
+            if template is None:
+                self._output(record)
+            else:
+                self._output(template, *pargs, **kwargs)
+            return
+        if self._format == 'ndjson':
+            data = json.dumps(record, default=json_default,
+                separators=(',', ':')) + '\n'
+        elif getattr(self._local, 'listed', None) is None:
+            data = json.dumps(record, default=json_default, indent=2) + '\n'
+        else:
+            data = ('[\n' if not self._local.listed else ',\n') + \
+                json.dumps(record, default=json_default, indent=2)
+            self._local.listed += 1
+        self._write(data)
+
+    @contextlib.contextmanager
+    def _output_list(self):
+        """Collect the records output inside this into one list, written a
+        record at a time as a JSON array in the json format
+        """
+        outer = getattr(self._local, 'listed', None)
+        self._local.listed = 0
+        try:
+            yield
+        finally:
+            if self._format == 'json':
+                self._write('\n]\n' if self._local.listed else '[]\n')
+            self._local.listed = outer
+
+    def _write(self, data):
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+    @contextlib.contextmanager
+    def _paged(self, enabled=True):
+        """Stream the text output inside this into $PAGER as it's written,
+        if stdout is a terminal
+        """
+        pager = os.environ.get('PAGER', 'less')
+        if not enabled or self._format != 'text' or pager in ('', 'cat') or \
+                not getattr(sys.stdout, 'isatty', lambda: False)():
+            yield
+            return
+        import codecs
+        import errno
+        env = dict(os.environ)
+        #like git, don't page output that fits on one screen
+        env.setdefault('LESS', 'FRX')
+        proc = subprocess.Popen(pager, shell=True, stdin=subprocess.PIPE,
+            env=env)
+        stdout = sys.stdout
+        sys.stdout = codecs.getwriter(getattr(stdout, 'encoding', None) or
+            'utf-8')(proc.stdin)
         try:
-            repo = git.Repo(os.getcwd())
-        except git.exc.InvalidGitRepositoryError:
-            repo = None
+            yield
+        except IOError as e:
+            #the pager was quit before reading everything
+            if e.errno != errno.EPIPE:
+                raise
+        finally:
+            sys.stdout = stdout
+            try:
+                proc.stdin.close()
+            except IOError:
+                pass
+            proc.wait()
+
+    def _init_repo(self):
+        import git
+        with tracer.span('git', 'open repo'):
+            try:
+                repo = git.Repo(self._cwd or os.getcwd())
+            except git.exc.InvalidGitRepositoryError:
+                repo = None
         return repo
 
     def _init_github(self, username, password, repo=None):
+        import pygithub3
         repo_name = self._get_repo_name(repo)
-        return pygithub3.Github(login=username, password=password,
-            user=username, repo=repo_name)
+        options = {}
+        api_url = self._get_config_value('api-url', None, repo)
+        if api_url is not None:
+            #GitHub Enterprise, or a stand-in like bench/fakehub.py
+            options['base_url'] = api_url.rstrip('/') + '/'
+        github = pygithub3.Github(login=username, password=password,
+            user=username, repo=repo_name, **options)
+        #every service gets its own session from pygithub3, swap them all for
+        #one requester (and connection pool) with the same auth and params
+        requester = None
+        for client in iter_service_clients(github):
+            if requester is None:
+                requester = self._init_requester(client.requester.auth,
+                    client.requester.params, repo)
+            client.requester = requester
+        self._requester = requester
+        return github
+
+    def _init_requester(self, auth, params, repo=None):
+        pool_size = int(self._get_config_value('http-pool-size',
+            max(10, self.DEFAULT_WORKERS), repo))
+        session = get_http_session(pool_size=pool_size,
+            timeout=float(self._get_config_value('http-timeout', 30, repo)),
+            compress=self._get_config_flag('http-compress', True, repo))
+        login = (auth or (None,))[0]
+        limiter = get_rate_limiter(login,
+            max_concurrency=pool_size,
+            state_path=os.path.join(get_cache_dir(),
+                'ratelimit-{0}.json'.format(login)),
+            max_wait=float(self._get_config_value('rate-limit-wait', 3600, repo)),
+            reserve=int(self._get_config_value('rate-limit-reserve', 0, repo)))
+        return CachingRequester(session, self._response_cache, auth, params,
+            limiter)
+
+    def _output_stats(self):
+        """Write a summary of the API requests made so far to stderr
+        """
+        requester = self.__dict__.get('_requester')
+        if requester is None:
+            sys.stderr.write('No API requests made\n')
+            return
+        stats = dict(requester.stats)
+        stats['opened'] = get_connection_count(requester._session)
+        stats['reused'] = max(stats['sent'] - stats['opened'], 0)
+        sys.stderr.write('{requests} API request(s): {cache_hits} answered ' \
+            'from cache, {not_modified} revalidated (304), {sent} sent over ' \
+            '{opened} new connection(s) and {reused} reused one(s)\n'.format(
+                **stats))
+
+    def _init_response_cache(self, repo=None):
+        if not self._get_config_flag('cache', True, repo):
+            return None
+        cache_dir = self._get_config_value('cache-dir', None, repo)
+        if cache_dir is None:
+            cache_dir = get_cache_dir('http')
+        cache_size = self._get_config_value('cache-size', None, repo)
+        if cache_size is None:
+            return ResponseCache(cache_dir)
+        else:
+            return ResponseCache(cache_dir, int(cache_size) * 1024 * 1024)
 
     @property
     def _current_repo_name(self):
@@ -179,7 +1463,18 @@ class GithubActor(object):
         else:
             return None
 
-    def _get_github_credentials(self, repo=None):
+    def _get_config(self, repo=None):
+        """Get the gitconfig for :repo:, or just the user's gitconfig, read
+        once and reused by every later lookup
+        """
+        key = None if repo is None else repo.git_dir
+        configs = self.__dict__.setdefault('_configs', {})
+        if key not in configs:
+            configs[key] = self._read_config(repo)
+        return configs[key]
+
+    def _read_config(self, repo=None):
+        import git
         if repo is None:
             user_cfg_file = os.path.expanduser('~/.gitconfig')
             if os.path.exists(user_cfg_file):
@@ -192,12 +1487,59 @@ class GithubActor(object):
                                  """.format(self.CONFIG_NS))
         else:
             cfg = repo.config_reader()
+        #now rather than on the first lookup, which may be in a worker thread
+        cfg.read()
+        return cfg
 
+    def _get_config_value(self, option, default=None, repo=None):
+        """Get the value of :option: from the hub section of the gitconfig, or
+        :default: if it isn't set
+        """
+        try:
+            return self._get_config(repo).get_value(self.CONFIG_NS, option)
+        except Exception:
+            return default
+
+    def _get_config_flag(self, option, default=False, repo=None):
+        value = self._get_config_value(option, None, repo)
+        if value is None:
+            return default
+        return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+    def _get_github_credentials(self, repo=None):
+        cfg = self._get_config(repo)
         return (cfg.get_value(self.CONFIG_NS, 'username'),
             cfg.get_value(self.CONFIG_NS, 'password'))
 
+    def _get_target(self, user=None, repo=None, **kwargs):
+        """Get the (user, repo) a command should act on, from the --user and
+        --repo options or the current repo
+        """
+        return (user or self._current_user, repo or self._current_repo_name)
+
+    def _get_indexed_repo(self, **kwargs):
+        """Get the full name of the target repo if it's been synced to the
+        index, None otherwise
+        """
+        full_name = '{0}/{1}'.format(*self._get_target(**kwargs))
+        if self._index.get_watermark(full_name) is None:
+            self._output('{0} hasn\'t been indexed yet, run index-sync first',
+                full_name)
+            return None
+        return full_name
+
     def _get_padding(self, f, iterable):
-        return max(len(f(i)) for i in iterable)
+        return max([len(f(i)) for i in iterable] or [0])
+
+    def _list_rows(self, service, request, row_type=None, **params):
+        """Get the paged result of :request: with each page decoded straight
+        into compact :row_type: rows in the text format, or into plain dicts
+        (every field, for the json formats or with no :row_type:)
+        """
+        if self._format != 'text':
+            row_type = None
+        request.resource = RecordLoader(row_type)
+        return service._get_result(request, **params)
 
     def _require_in_repo(func):
         @functools.wraps(func)
@@ -212,13 +1554,43 @@ class GithubActor(object):
             pass
         return wrapper
 
+    def _wait_for_fork(self, user, repo, timeout=FORK_TIMEOUT):
+        """Poll until the (freshly created) fork :user:/:repo: can be cloned,
+        backing off exponentially with jitter for up to :timeout: seconds
+
+        Returns the fork's repo info and how many seconds it took to be ready
+        """
+        import git
+        from pygithub3.exceptions import NotFound
+
+        start = time.time()
+        deadline = start + timeout
+        delay = 0.5
+        checks = 0
+        while True:
+            checks += 1
+            try:
+                gh_repo = self._github.repos.get(user=user, repo=repo)
+                #the repo shows up in the API before its git data is copied,
+                #it's usable once it has refs to clone
+                if git.cmd.Git().ls_remote(gh_repo.ssh_url, heads=True).strip():
+                    return (gh_repo, time.time() - start)
+            except (NotFound, git.exc.GitCommandError):
+                pass
+            now = time.time()
+            if now >= deadline:
+                raise ValueError('Fork {0}/{1} still isn\'t ready after {2:.0f}s ' \
+                    '({3} checks), try again with a longer --fork-timeout'.format(
+                        user, repo, now - start, checks))
+            time.sleep(min(delay * random.uniform(0.5, 1.5), deadline - now))
+            delay = min(delay * 2, 10)
+
     @ArgFunc.auto_define_args
-    def develop(self, org=None, **kwargs):
+    def develop(self, org=None, fork_timeout=FORK_TIMEOUT, **kwargs):
         """Clone a repo so you can start working on it, forking to your account
         if needed
         """
-        target_user = kwargs.get('user', self._current_user)
-        target_repo = kwargs.get('repo', self._current_repo_name)
+        (target_user, target_repo) = self._get_target(**kwargs)
         if os.path.exists(os.path.join(os.getcwd(), target_repo)):
             raise ValueError('Looks like the repo already exists at {0}'.format(
                 os.path.join(os.getcwd(), target_repo)))
@@ -234,16 +1606,21 @@ class GithubActor(object):
             except AssertionError:
                 pass
             self._output('Waiting for GitHub to stop forking around...')
-            time.sleep(5)
-        self._output('Getting repo info...')
-        gh_repo = self._github.repos.get(
-            user=self._current_user,
-            repo=target_repo,
-        )
+            (gh_repo, waited) = self._wait_for_fork(org or self._current_user,
+                target_repo, float(fork_timeout))
+            self._output('Fork was ready after {0:.1f}s', waited)
+        else:
+            self._output('Getting repo info...')
+            gh_repo = self._github.repos.get(
+                user=self._current_user,
+                repo=target_repo,
+            )
         repo_path = os.path.join(os.getcwd(), gh_repo.name)
         self._output('Cloning repo {0} ...', gh_repo.full_name)
-        git.repo.base.Repo.clone_from(gh_repo.ssh_url, repo_path)
-        self._output('Repo cloned to {0}, enjoy!', repo_path)
+        self._clone_repo(gh_repo, repo_path, url=gh_repo.ssh_url)
+        self._output_record({'full_name': gh_repo.full_name,
+            'forked': target_user != self._current_user, 'path': repo_path},
+            'Repo cloned to {0}, enjoy!', repo_path)
 
     @ArgFunc.auto_define_args
     def repos_show(self, **kwargs):
@@ -260,23 +1637,36 @@ class GithubActor(object):
         gh_repo = self._github.repos.get(
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name))
-        self._output(display_tpl, repo=gh_repo)
+        self._output_record(gh_repo, display_tpl, repo=gh_repo)
 
     @ArgFunc.define_args(
         repo_type={'choices': ('all', 'owner', 'public', 'private', 'member'), 'default': 'all'},
+        stream={'action': 'store_true', 'default': False,
+            'help': 'Print each page of repos as it arrives, widening the columns as needed'},
+        limit={'type': int, 'default': None,
+            'help': 'Stop after this many repos'},
     )
-    def repos_list(self, repo_type='all', **kwargs):
+    def repos_list(self, repo_type='all', stream=False, limit=None, **kwargs):
         """List your or another user's repos
         """
 
-        repos = self._github.repos.list(
-            user=kwargs.get('user', self._current_user),
-            type=repo_type).all()
-        padding = self._get_padding(lambda r: r.name, repos)
-        for repo in repos:
-            fork_icon = 'V' if repo.fork else '|'
-            self._output(' {fork_icon} {name: <{padding}} -- {description}',
-                fork_icon=fork_icon, padding=padding, **vars(repo))
+        service = self._github.repos
+        pages = iter_pages(self._list_rows(service, service.request_builder(
+            'repos.list', user=kwargs.get('user', self._current_user)),
+            RepoRow, type=repo_type), limit)
+        if not stream and self._format == 'text':
+            pages = [[item for page in pages for item in page]]
+        padding = 0
+        with self._output_list():
+            for repos in pages:
+                if self._format == 'text':
+                    padding = max(padding, self._get_padding(lambda r: r.name,
+                        repos))
+                for repo in repos:
+                    fork_icon = 'V' if get_field(repo, 'fork') else '|'
+                    self._output_record(repo,
+                        ' {fork_icon} {repo.name: <{padding}} -- {repo.description}',
+                        fork_icon=fork_icon, padding=padding, repo=repo)
 
     @ArgFunc.auto_define_args
     def repos_create(self, description='', homepage='', private=False,
@@ -289,25 +1679,31 @@ class GithubActor(object):
         del data['self'], data['kwargs'], data['in_org']
         data['name'] = kwargs.get('repo', self._current_repo_name)
         new_repo = self._github.repos.create(data, in_org)
+        self._output_record(new_repo, 'Repo {repo.full_name} created: ' \
+            '{repo.html_url}', repo=new_repo)
 
     @ArgFunc.auto_define_args
     def repos_fork(self, org=None, **kwargs):
         """Fork a repo on GitHub to your account (or organization)
         """
 
+        (user, repo) = self._get_target(**kwargs)
+        fork = None
         try:
-            self._github.repos.forks.create(
-                user=kwargs.get('user', self._current_user),
-                repo=kwargs.get('repo', self._current_repo_name),
+            fork = self._github.repos.forks.create(user=user, repo=repo,
                 org=org)
         except AssertionError:
             pass
+        if fork is None:
+            fork = {'full_name': '{0}/{1}'.format(org or self._current_user,
+                repo)}
+        self._output_record(fork, 'Forking {0}/{1} to {2}', user, repo,
+            get_field(fork, 'full_name'))
 
     @ArgFunc.auto_define_args
     def repos_clone(self, **kwargs):
         """Clone a repo from GitHub
         """
-
         repo_name = kwargs.get('repo', None)
         if repo_name is None:
             raise ValueError('Use --repo to tell me the repo name')
@@ -319,15 +1715,300 @@ class GithubActor(object):
             #TODO make this not dumb
             raise e
         repo_path = os.path.join(os.getcwd(), repo_name)
-        if github_repo.permissions['push']:
-            git.repo.base.Repo.clone_from(github_repo.ssh_url, repo_path)
-        else:
-            git.repo.base.Repo.clone_from(github_repo.git_url, repo_path)
-        self._output('Cloned {user}/{repo} to {path}',
+        self._clone_repo(github_repo, repo_path)
+        self._output_record({'full_name': github_repo.full_name,
+                'path': repo_path},
+            'Cloned {user}/{repo} to {path}',
             user=kwargs.get('user', self._current_user),
             repo=repo_name,
             path=repo_path)
 
+    def _get_clone_url(self, gh_repo):
+        """Get the url to clone :gh_repo: from: ssh if we can push to it, the
+        read-only git url otherwise
+        """
+        if get_field(gh_repo, 'permissions', {}).get('push'):
+            return gh_repo.ssh_url
+        else:
+            return gh_repo.git_url
+
+    def _get_git_error(self, error):
+        """Get the interesting line out of a GitCommandError
+        """
+        errors = [line for line in
+            (getattr(error, 'stderr', None) or '').splitlines()
+            if line.startswith(('fatal:', 'error:'))]
+        return errors[0] if errors else error
+
+    def _list_repos(self, org=None, repo_type='all', **kwargs):
+        """Get all of :org:'s repos, or a user's if :org: is None
+        """
+        if org is None:
+            user = kwargs.get('user')
+            if user in (None, self._current_user):
+                #only /user/repos includes the logged in user's private repos,
+                #and make_request would fill the user back in
+                user = None
+            service = self._github.repos
+            return service._get_result(service.request_builder('repos.list',
+                user=user), type=repo_type).all()
+        else:
+            return self._github.repos.list_by_org(org, type=repo_type).all()
+
+    def _clone_repo(self, gh_repo, repo_path, url=None, reference=None,
+            **options):
+        """Clone :gh_repo: to :repo_path:, :options: are passed to git clone
+
+        With :reference: (or the reference-cache option if it's None) the
+        clone borrows objects from the shared store for the repo's fork
+        network, so only objects missing from it are transferred. Shallow
+        and partial clones don't use the store.
+        """
+        import git
+
+        if url is None:
+            url = self._get_clone_url(gh_repo)
+        if reference is None:
+            reference = self._get_config_flag('reference-cache')
+        if options.get('depth') or options.get('filter'):
+            #filling the store means fetching the full history, which is what
+            #these are meant to avoid
+            reference = False
+        if reference:
+            try:
+                options['reference'] = self._update_reference_store(gh_repo,
+                    url)
+            except (git.exc.GitCommandError, EnvironmentError) as e:
+                self._output('Not using the reference cache: {0}',
+                    self._get_git_error(e))
+        return git.repo.base.Repo.clone_from(url, repo_path, **options)
+
+    def _get_network_root(self, gh_repo):
+        """Get the full name of the repo at the root of :gh_repo:'s fork
+        network
+        """
+        if get_field(gh_repo, 'fork') and \
+                get_field(gh_repo, 'source') is None:
+            #repo listings don't include the source, only the repo itself does
+            (user, repo) = gh_repo.full_name.split('/')
+            gh_repo = self._github.repos.get(user=user, repo=repo)
+        return get_field(get_field(gh_repo, 'source'), 'full_name',
+            gh_repo.full_name)
+
+    def _update_reference_store(self, gh_repo, url):
+        """Fetch :url: into the shared object store for :gh_repo:'s fork
+        network, creating it if needed, and return the store's path
+
+        Each repo's branches and tags are kept under refs/forks/<full name>/,
+        including ones deleted upstream, and auto gc and pruning are off in
+        the store, so objects a clone borrows are never deleted (even once a
+        force push leaves them unreachable).
+        """
+        import fcntl
+        import git
+
+        store_dir = self._get_config_value('reference-cache-dir', None)
+        if store_dir is None:
+            store_dir = get_cache_dir('objects')
+        store_path = os.path.join(store_dir,
+            self._get_network_root(gh_repo) + '.git')
+        if not os.path.isdir(store_path):
+            os.makedirs(store_path)
+        with open(store_path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                store = git.cmd.Git(store_path)
+                if not os.path.exists(os.path.join(store_path, 'HEAD')):
+                    store.init(bare=True)
+                #also for stores made before these were set
+                store.config('gc.auto', '0')
+                store.config('gc.pruneExpire', 'never')
+                namespace = 'refs/forks/{0}'.format(gh_repo.full_name)
+                store.fetch(url,
+                    '+refs/heads/*:{0}/heads/*'.format(namespace),
+                    '+refs/tags/*:{0}/tags/*'.format(namespace),
+                    no_tags=True)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return store_path
+
+    @ArgFunc.define_args(
+        org={'default': None,
+            'help': 'Clone an organization\'s repos instead of a user\'s'},
+        repo_type={'choices': ('all', 'owner', 'public', 'private', 'member'), 'default': 'all'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of repos to clone at once'},
+        depth={'type': int, 'default': None,
+            'help': 'Make shallow clones with this many commits of history'},
+        single_branch={'action': 'store_true', 'default': False,
+            'help': 'Only clone the default branch of each repo'},
+        filter={'default': None,
+            'help': 'Make partial clones with this object filter, like blob:none'},
+    )
+    def repos_clone_all(self, org=None, repo_type='all', workers=DEFAULT_WORKERS,
+            depth=None, single_branch=False, filter=None, **kwargs):
+        """Clone all of your, another user's or an organization's repos
+        """
+        import git
+
+        repos = self._list_repos(org, repo_type, **kwargs)
+        options = {}
+        if depth:
+            options['depth'] = depth
+        if single_branch:
+            options['single_branch'] = True
+        if filter:
+            options['filter'] = filter
+
+        def clone(gh_repo):
+            repo_path = os.path.join(os.getcwd(), gh_repo.name)
+            if os.path.exists(repo_path):
+                return (gh_repo, 'skipped', None, 0)
+            start = time.time()
+            try:
+                self._clone_repo(gh_repo, repo_path, **options)
+            except git.exc.GitCommandError as e:
+                return (gh_repo, 'failed', self._get_git_error(e),
+                    time.time() - start)
+            return (gh_repo, 'cloned', get_dir_size(repo_path),
+                time.time() - start)
+
+        start = time.time()
+        counts = dict.fromkeys(('cloned', 'skipped', 'failed'), 0)
+        total_size = 0
+        width = len(str(len(repos)))
+        with self._output_list():
+            for (done, (gh_repo, status, detail, elapsed)) in enumerate(
+                    imap_pool(clone, repos, workers, ordered=False), 1):
+                counts[status] += 1
+                record = {'full_name': gh_repo.full_name, 'status': status,
+                    'path': os.path.join(os.getcwd(), gh_repo.name),
+                    'seconds': round(elapsed, 3)}
+                if status == 'cloned':
+                    total_size += detail
+                    record['size'] = detail
+                    detail = '{0:.1f} MB in {1:.1f}s'.format(
+                        detail / 1048576.0, elapsed)
+                elif status == 'skipped':
+                    detail = 'already present'
+                else:
+                    record['error'] = str(detail)
+                self._output_record(record,
+                    '[{done: >{width}}/{total}] {status: <7} {name} ({detail})',
+                    done=done, width=width, total=len(repos), status=status,
+                    name=gh_repo.full_name, detail=detail)
+        elapsed = max(time.time() - start, 0.001)
+        self._output('Cloned {cloned} repo(s) ({skipped} already present, ' \
+            '{failed} failed) in {elapsed:.1f}s: {rate:.2f} repos/s, ' \
+            '{size:.1f} MB at {mb_rate:.2f} MB/s',
+            elapsed=elapsed, rate=counts['cloned'] / elapsed,
+            size=total_size / 1048576.0, mb_rate=total_size / 1048576.0 / elapsed,
+            **counts)
+
+    @ArgFunc.define_args(
+        path={'default': '.',
+            'help': 'Directory to keep the mirrors in'},
+        org={'default': None,
+            'help': 'Mirror an organization\'s repos instead of a user\'s'},
+        repo_type={'choices': ('all', 'owner', 'public', 'private', 'member'), 'default': 'all'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of mirrors to update at once'},
+        keep_deleted={'action': 'store_true', 'default': False,
+            'help': 'Keep mirrors of repos that no longer exist on GitHub'},
+    )
+    def repos_mirror(self, path='.', org=None, repo_type='all',
+            workers=DEFAULT_WORKERS, keep_deleted=False, **kwargs):
+        """Keep bare mirrors of a user's or an organization's repos in sync
+
+        Mirrors are cloned into --path, fetched when their repo has been
+        pushed to since the last run and pruned once it's deleted.
+        """
+        import git
+
+        path = os.path.abspath(path)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        #maps repo name to its pushed_at as of the last successful update,
+        #and to the listing it was last mirrored from
+        state_path = os.path.join(path, self.MIRROR_STATE)
+        try:
+            with open(state_path) as handle:
+                saved = json.load(handle)
+        except (IOError, ValueError):
+            saved = {}
+        if not isinstance(saved.get('repos'), dict):
+            #written before listings were recorded, so none are pruned
+            saved = {'repos': saved, 'sources': {}}
+        (state, sources) = (saved['repos'], saved['sources'])
+        source = 'org:{0}'.format(org) if org else 'user:{0}'.format(
+            kwargs.get('user') or self._current_user)
+        source += '/' + repo_type
+        repos = self._list_repos(org, repo_type, **kwargs)
+
+        def update(gh_repo):
+            mirror_path = os.path.join(path, gh_repo.name + '.git')
+            pushed_at = format_timestamp(get_field(gh_repo, 'pushed_at'))
+            exists = os.path.isdir(mirror_path)
+            if exists and pushed_at and state.get(gh_repo.name) == pushed_at:
+                sources[gh_repo.name] = source
+                return (gh_repo, 'current', 0, None)
+            objects_path = os.path.join(mirror_path, 'objects')
+            before = get_dir_size(objects_path) if exists else 0
+            try:
+                if exists:
+                    git.cmd.Git(mirror_path).fetch('origin', prune=True)
+                else:
+                    self._clone_repo(gh_repo, mirror_path, reference=False,
+                        mirror=True)
+            except git.exc.GitCommandError as e:
+                return (gh_repo, 'failed', 0, self._get_git_error(e))
+            state[gh_repo.name] = pushed_at
+            sources[gh_repo.name] = source
+            return (gh_repo, 'fetched' if exists else 'cloned',
+                max(get_dir_size(objects_path) - before, 0), None)
+
+        start = time.time()
+        counts = dict.fromkeys(('current', 'fetched', 'cloned', 'failed',
+            'pruned'), 0)
+        fetched_size = 0
+        with self._output_list():
+            for (gh_repo, status, size, error) in imap_pool(update, repos,
+                    workers, ordered=False):
+                counts[status] += 1
+                fetched_size += size
+                record = {'full_name': gh_repo.full_name, 'status': status,
+                    'path': os.path.join(path, gh_repo.name + '.git'),
+                    'size': size}
+                if status == 'failed':
+                    record['error'] = str(error)
+                    self._output_record(record, 'Failed to update {0}: {1}',
+                        gh_repo.full_name, error)
+                elif status != 'current':
+                    self._output_record(record, '{0: <7} {1} ({2:.1f} MB)',
+                        status, gh_repo.full_name, size / 1048576.0)
+            names = set(gh_repo.name for gh_repo in repos)
+            for name in sorted(set(state) - names):
+                #a listing of another user's or org's repos, or of another
+                #type, says nothing about whether this one still exists
+                if keep_deleted or sources.get(name) != source:
+                    continue
+                mirror_path = os.path.join(path, name + '.git')
+                if os.path.isdir(mirror_path):
+                    shutil.rmtree(mirror_path)
+                del state[name], sources[name]
+                counts['pruned'] += 1
+                self._output_record({'name': name, 'status': 'pruned',
+                    'path': mirror_path}, 'pruned  {0}', name)
+        (fd, tmp_path) = tempfile.mkstemp(dir=path)
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(saved, handle, indent=1, sort_keys=True)
+        os.rename(tmp_path, state_path)
+        self._output('{total} mirror(s): {current} current, {fetched} ' \
+            'fetched, {cloned} cloned, {failed} failed, {pruned} pruned; ' \
+            '{size:.1f} MB fetched in {elapsed:.1f}s',
+            total=len(repos), size=fetched_size / 1048576.0,
+            elapsed=time.time() - start, **counts)
+
     @_require_in_repo
     @ArgFunc.auto_define_args
     def repos_addremote(self, remote_name=GIT_REMOTE_NAME, **kwargs):
@@ -336,59 +2017,106 @@ class GithubActor(object):
 
         actual_repo = self._current_repo
         if remote_name in (rm.name for rm in actual_repo.remotes):
-            self._output('Looks like the "{0}" remote already exists',
-                remote_name)
+            self._output_record({'remote': remote_name, 'status': 'exists'},
+                'Looks like the "{0}" remote already exists', remote_name)
         else:
             github_repo = self._github.repos.get(
                 user=kwargs.get('user', self._current_user),
                 repo=kwargs.get('repo', self._current_repo_name))
-            if github_repo.permissions['push']:
-                #read-write, use ssh url
-                actual_repo.create_remote(remote_name, github_repo.ssh_url)
-            else:
-                #read only, use git url
-                actual_repo.create_remote(remote_name, github_repo.git_url)
-            self._output('"{0}" remote added', remote_name)
+            url = self._get_clone_url(github_repo)
+            actual_repo.create_remote(remote_name, url)
+            self._output_record({'remote': remote_name, 'url': url,
+                'status': 'added'}, '"{0}" remote added', remote_name)
 
     @ArgFunc.auto_define_args
-    def pr_show(self, pr_number, DUMMYOPT=None, **kwargs):
+    def pr_show(self, pr_number, DUMMYOPT=None, cached=False, **kwargs):
         """Display a pull request
         """
 
+        if cached:
+            full_name = self._get_indexed_repo(**kwargs)
+            if full_name is not None:
+                self._output_record(self._index.get_pull(full_name,
+                    int(pr_number)))
+            return
         pr = self._github.pull_requests.get(pr_number,
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name))
-        self._output(vars(pr))
+        if self._format == 'text':
+            self._output(vars(pr))
+        else:
+            self._output_record(pr)
 
     @ArgFunc.define_args(
         state={'choices': ('open', 'closed'), 'default': 'open'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of PRs to fetch commit counts for at once'},
+        cached={'action': 'store_true', 'default': False,
+            'help': 'List from the local index instead of GitHub'},
+        stream={'action': 'store_true', 'default': False,
+            'help': 'Print each page of PRs as it arrives, widening the columns as needed'},
+        limit={'type': int, 'default': None,
+            'help': 'Stop after this many PRs'},
     )
-    def pr_list(self, state='open', **kwargs):
+    def pr_list(self, state='open', workers=DEFAULT_WORKERS, cached=False,
+            stream=False, limit=None, **kwargs):
         """List the open pull requests for a repo
 
         Note that the --state option is currently non-functional
         """
 
-        pull_requests = self._github.pull_requests.list(
-            user=kwargs.get('user', kwargs.get('user', self._current_user)),
-            repo=kwargs.get('repo', self._current_repo_name)).all()
-        padding = self._get_padding(lambda pr: pr.user['login'], pull_requests)
-        for pr in pull_requests:
-            commit_count = len(self._github.pull_requests.list_commits(pr.number,
-                user=kwargs.get('user', kwargs.get('user', self._current_user)),
-                repo=kwargs.get('repo', self._current_repo_name)).all())
-            self._output('#{number:0>4} {commit_count:0>2}c @{user[login]: <{padding}} {title} -- <{html_url}>',
-                padding=padding, commit_count=commit_count, **vars(pr))
+        if cached:
+            full_name = self._get_indexed_repo(**kwargs)
+            if full_name is not None:
+                rows = self._index.list_issues(full_name, state=state,
+                    pulls=True)
+                pull_requests = rows.fetchmany(limit) if limit else \
+                    rows.fetchall()
+                padding = self._get_padding(lambda pr: pr['user'], pull_requests)
+                with self._output_list():
+                    for pr in pull_requests:
+                        self._output_record(as_record(pr),
+                            '#{number:0>4} {commit_count:0>2}c @{user: <{padding}} {title} -- <{pull_url}>',
+                            padding=padding, commit_count=pr['commits'] or 0,
+                            **dict(pr))
+            return
+        user = kwargs.get('user', self._current_user)
+        repo = kwargs.get('repo', self._current_repo_name)
+        service = self._github.pull_requests
+        pages = iter_pages(self._list_rows(service, service.make_request(
+            'pull_requests.list', user=user, repo=repo), PullRow), limit)
+        if not stream and self._format == 'text':
+            pages = [[item for page in pages for item in page]]
+        def with_commit_count(pr):
+            #only the number of commits is needed, so skip building them
+            commits = self._list_rows(service, service.make_request(
+                'pull_requests.list_commits', number=get_field(pr, 'number'),
+                user=user, repo=repo))
+            return (pr, sum(len(page) for page in iter_pages(commits)))
+        padding = 0
+        with self._output_list():
+            for pull_requests in pages:
+                if self._format == 'text':
+                    padding = max(padding, self._get_padding(
+                        lambda pr: pr.user, pull_requests))
+                for (pr, commit_count) in imap_pool(with_commit_count,
+                        pull_requests, workers):
+                    if self._format != 'text':
+                        pr['commit_count'] = commit_count
+                    self._output_record(pr,
+                        '#{pr.number:0>4} {commit_count:0>2}c @{pr.user: <{padding}} {pr.title} -- <{pr.html_url}>',
+                        padding=padding, commit_count=commit_count, pr=pr)
 
     @ArgFunc.auto_define_args
     def pr_merge(self, pr_number, commit_message='', **kwargs):
         """Do a simple merge of a pull request (Merge Button)
         """
 
-        self._github.pull_requests.merge(number, commit_message,
+        result = self._github.pull_requests.merge(pr_number, commit_message,
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name))
-        self._output('Pull request #{0:0>4} merged!', pr_number)
+        self._output_record(dict(as_record(result), number=pr_number),
+            'Pull request #{0:0>4} merged!', pr_number)
 
     @_require_in_repo
     @ArgFunc.auto_define_args
@@ -405,34 +2133,263 @@ class GithubActor(object):
             repo=kwargs.get('repo', self._current_repo_name))
 
         if remote_name in (rm.name for rm in repo.remotes):
-            self._output('Looks like the "{0}" remote already exists',
-                remote_name)
+            self._output_record({'remote': remote_name, 'status': 'exists'},
+                'Looks like the "{0}" remote already exists', remote_name)
         else:
-            repo.create_remote(remote_name, pr.head['repo']['git_url'])
-            self._output('"{0}" remote added', remote_name)
+            url = pr.head['repo']['git_url']
+            repo.create_remote(remote_name, url)
+            self._output_record({'remote': remote_name, 'url': url,
+                'status': 'added'}, '"{0}" remote added', remote_name)
 
+    @_require_in_repo
+    @ArgFunc.define_args(
+        pr_numbers={'type': int, 'nargs': '*', 'metavar': 'pr_number',
+            'help': 'Only fetch these PRs, instead of all of them'},
+        merge={'action': 'store_true', 'default': False,
+            'help': 'Also fetch the refs GitHub keeps for merging each PR'},
+        remote_name={'default': GIT_REMOTE_NAME,
+            'help': 'Remote to fetch from if it exists, and to name the refs after'},
+    )
+    def pr_fetch(self, pr_numbers=None, merge=False,
+            remote_name=GIT_REMOTE_NAME, **kwargs):
+        """Fetch PR heads to refs/pull/<remote>/head/<number>
 
-    @ArgFunc.auto_define_args
-    def issues_show(self, issue_number, DUMMYOPT=None, **kwargs):
+        Every PR's head comes from the base repo in a single fetch. The refs
+        are kept out of refs/remotes/<remote>/ so fetching that remote with
+        --prune doesn't delete them.
+        """
+        import git
+
+        repo = self._current_repo
+        if kwargs.get('user') is None and kwargs.get('repo') is None and \
+                remote_name in (rm.name for rm in repo.remotes):
+            source = remote_name
+        else:
+            (user, repo_name) = self._get_target(**kwargs)
+            source = self._get_clone_url(self._github.repos.get(user=user,
+                repo=repo_name))
+        kinds = ['head', 'merge'] if merge else ['head']
+        local_refs = ['refs/pull/{0}/{1}'.format(remote_name, kind)
+            for kind in kinds]
+
+        def get_refspecs(kind, numbers):
+            local = 'refs/pull/{0}/{1}'.format(remote_name, kind)
+            if not numbers:
+                return ['+refs/pull/*/{0}:{1}/*'.format(kind, local)]
+            return ['+refs/pull/{0}/{1}:{2}/{0}'.format(n, kind, local)
+                for n in numbers]
+
+        def get_refs():
+            output = repo.git.for_each_ref(*local_refs,
+                format='%(objectname) %(refname)')
+            return dict(reversed(line.split(' ', 1))
+                for line in output.splitlines())
+
+        before = get_refs()
+        try:
+            repo.git.fetch(source, *get_refspecs('head', pr_numbers),
+                no_tags=True)
+        except git.exc.GitCommandError as e:
+            raise ValueError(self._get_git_error(e))
+        if merge:
+            #GitHub has no merge ref for closed or conflicting PRs, so these
+            #are best effort: one fetch, then one per PR if any were missing
+            try:
+                repo.git.fetch(source, *get_refspecs('merge', pr_numbers),
+                    no_tags=True)
+            except git.exc.GitCommandError as e:
+                if not pr_numbers:
+                    raise ValueError(self._get_git_error(e))
+                for n in pr_numbers:
+                    try:
+                        repo.git.fetch(source, *get_refspecs('merge', [n]),
+                            no_tags=True)
+                    except git.exc.GitCommandError:
+                        self._output('No merge ref for #{0:0>4}, it may be ' \
+                            'closed or have conflicts', n)
+        after = get_refs()
+        if pr_numbers:
+            after = dict((ref, sha) for (ref, sha) in after.iteritems()
+                if ref.rsplit('/', 1)[1] in map(str, pr_numbers))
+        counts = dict.fromkeys(('new', 'updated', 'unchanged'), 0)
+        with self._output_list():
+            for ref in sorted(after,
+                    key=lambda ref: (ref.rsplit('/', 1)[0], len(ref), ref)):
+                if ref not in before:
+                    status = 'new'
+                elif before[ref] != after[ref]:
+                    status = 'updated'
+                else:
+                    counts['unchanged'] += 1
+                    continue
+                counts[status] += 1
+                self._output_record({'ref': ref, 'sha': after[ref],
+                    'previous_sha': before.get(ref), 'status': status},
+                    '{0: <7} {1} -> {2}', status, after[ref][:7],
+                    ref[len('refs/'):])
+        self._output('Fetched {total} PR ref(s) from {source}: {new} new, ' \
+            '{updated} updated, {unchanged} unchanged',
+            total=len(after), source=source, **counts)
+
+
+    def _list_issues_since(self, user, repo, since=None):
+        """List every issue (and PR) in a repo updated at or after :since:,
+        oldest first
+        """
+        #issues.list_by_repo() drops its since argument, so build the
+        #request ourselves
+        service = self._github.issues
+        request = service.make_request('issues.list_by_repo', user=user,
+            repo=repo)
+        params = {'state': 'all', 'sort': 'updated', 'direction': 'asc'}
+        if since is not None:
+            params['since'] = since
+        return service._get_result(request, **params)
+
+    @ArgFunc.define_args(
+        full={'action': 'store_true', 'default': False,
+            'help': 'Sync everything, not just what changed since the last sync'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of issues to fetch comments and PR info for at once'},
+    )
+    def index_sync(self, full=False, workers=DEFAULT_WORKERS, **kwargs):
+        """Sync a repo's issues, pull requests and comments to the local index
+        """
+
+        (user, repo) = self._get_target(**kwargs)
+        full_name = '{0}/{1}'.format(user, repo)
+        since = None if full else self._index.get_watermark(full_name) or None
+        watermark = since
+        changed = []
+        for issue in self._list_issues_since(user, repo, since).iterator():
+            self._index.add_issue(full_name, issue)
+            is_pull = bool(get_field(get_field(issue, 'pull_request'),
+                'html_url'))
+            changed.append((issue.number, issue.comments, is_pull))
+            updated_at = format_timestamp(issue.updated_at)
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+
+        def fetch_details(item):
+            (number, comment_count, is_pull) = item
+            comments = []
+            pull = None
+            if comment_count:
+                comments = self._github.issues.comments.list(number,
+                    user=user, repo=repo).all()
+            if is_pull:
+                pull = self._github.pull_requests.get(number,
+                    user=user, repo=repo)
+            return (number, comments, pull)
+        comment_count = 0
+        for (number, comments, pull) in imap_pool(fetch_details, changed,
+                workers):
+            self._index.set_comments(full_name, number, comments)
+            self._index.update_search(full_name, number)
+            comment_count += len(comments)
+            if pull is not None:
+                self._index.add_pull(full_name, pull)
+        self._index.set_watermark(full_name, watermark or '')
+        self._index.commit()
+        self._output('Synced {0} changed issue(s) ({1} pull request(s)) and ' \
+            '{2} comment(s) for {3}', len(changed),
+            sum(1 for (_, _, is_pull) in changed if is_pull), comment_count,
+            full_name)
+
+    @ArgFunc.define_args(
+        issue_number={'metavar': 'ISSUE_NUMBER'},
+        cached={'action': 'store_true', 'default': False,
+            'help': 'Show the issue from the local index instead of GitHub'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of pages of comments to fetch at once'},
+        no_pager={'action': 'store_true', 'default': False,
+            'help': 'Don\'t send the output to $PAGER'},
+    )
+    def issues_show(self, issue_number, cached=False, workers=DEFAULT_WORKERS,
+            no_pager=False, **kwargs):
         """Display a specific issue
         """
 
-        issue = self._github.issues.get(issue_number,
-            user=kwargs.get('user', self._current_user),
-            repo=kwargs.get('repo', self._current_repo_name))
+        if cached:
+            full_name = self._get_indexed_repo(**kwargs)
+            if full_name is not None:
+                with self._paged(not no_pager):
+                    self._show_indexed_issue(full_name, int(issue_number))
+            return
+        user = kwargs.get('user', self._current_user)
+        repo = kwargs.get('repo', self._current_repo_name)
+        issue = self._github.issues.get(issue_number, user=user, repo=repo)
+        comments = None
+        with self._paged(not no_pager):
+            if self._format == 'text':
+                msg = [
+                    '#{i.number:0>4} ({i.state}) -- {i.title}',
+                    '@{i.user.login}:',
+                ]
+                if issue.body:
+                    msg.append(self._wrap_text_body(issue.body))
+                self._output('\n'.join(msg), i=issue)
+            #print each page of comments while the later ones are fetched
+            fetched = []
+            for page in self._iter_comment_pages(issue, user, repo, workers):
+                fetched.extend(page)
+                if self._format == 'text':
+                    for comment in page:
+                        self._output('@{c.user.login}:\n{wrapped_body}',
+                            c=comment,
+                            wrapped_body=self._wrap_text_body(comment.body))
+            comments = fetched
+        if comments is None:
+            #the pager was quit before all the comments were fetched
+            return
+        if self._format != 'text':
+            self._output_record(as_record(issue,
+                comment_list=[as_record(c) for c in comments]))
+        full_name = '{0}/{1}'.format(*self._get_target(**kwargs))
+        self._index.add_issue(full_name, issue)
+        self._index.set_comments(full_name, issue.number, comments)
+        self._index.update_search(full_name, issue.number)
+        self._index.commit()
+
+    def _iter_comment_pages(self, issue, user, repo, workers=1):
+        """Get the comments on :issue: a page at a time, fetching the pages
+        after the first up to :workers: at once
+        """
+        if not issue.comments:
+            return
+        result = self._github.issues.comments.list(issue.number, user=user,
+            repo=repo)
+        #pygithub3 only reads the last page number from the first response it
+        #gets, and only the first page's Link header is sure to have it
+        first = result.getter(1)
+        #start on the rest while the first page is shown
+        pages = imap_pool(result.getter, range(2, result.getter.last + 1),
+            workers)
+        yield first
+        for page in pages:
+            yield page
+
+    def _show_indexed_issue(self, full_name, number):
+        issue = self._index.get_issue(full_name, number)
+        if issue is None:
+            self._output('#{0:0>4} isn\'t in the index for {1}', number,
+                full_name)
+            return
+        if self._format != 'text':
+            self._output_record(as_record(issue, comment_list=[as_record(c)
+                for c in self._index.get_comments(full_name, number)]))
+            return
         msg = [
-            '#{i.number:0>4} ({i.state}) -- {i.title}',
-            '@{i.user.login}:',
+            '#{number:0>4} ({state}) -- {title}',
+            '@{user}:',
         ]
-        if issue.body:
-            msg.append(self._wrap_text_body(issue.body))
-        self._output('\n'.join(msg), i=issue)
-        comments = self._github.issues.comments.list(issue_number,
-            user=kwargs.get('user', self._current_user),
-            repo=kwargs.get('repo', self._current_repo_name)).all()
-        for comment in comments:
-            self._output('@{c.user.login}:\n{wrapped_body}',
-                c=comment, wrapped_body=self._wrap_text_body(comment.body))
+        if issue['body']:
+            msg.append('{wrapped_body}')
+        self._output('\n'.join(msg),
+            wrapped_body=self._wrap_text_body(issue['body'] or ''), **dict(issue))
+        for comment in self._index.get_comments(full_name, number):
+            self._output('@{user}:\n{wrapped_body}',
+                wrapped_body=self._wrap_text_body(comment['body']), **dict(comment))
 
     def _wrap_text_body(self, text, padding=8):
         """Wrap :text: so that there are :padding: spaces on either side, based on
@@ -445,10 +2402,21 @@ class GithubActor(object):
 
     @ArgFunc.auto_define_args
     def issues_list(self, milestone='none', state='open', assignee='none', labels='',
-            sort='created', **kwargs):
+            sort='created', cached=False, **kwargs):
         """List a repo's issues
         """
 
+        if cached:
+            full_name = self._get_indexed_repo(**kwargs)
+            if full_name is not None:
+                with self._output_list():
+                    for issue in self._index.list_issues(full_name,
+                            state=state, assignee=assignee, milestone=milestone,
+                            labels=labels, sort=sort):
+                        self._output_record(as_record(issue),
+                            '#{number:0>4} ({state}) @{user: <16} -- {title}',
+                            **dict(issue))
+            return
         issues = self._github.issues.list_by_repo(
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name),
@@ -458,10 +2426,57 @@ class GithubActor(object):
             labels=labels,
             sort=sort,
         )
-        for page in issues:
-            for issue in page:
-                self._output('#{issue.number:0>4} ({issue.state}) @{issue.user.login: <16} -- {issue.title}',
-                    issue=issue)
+        full_name = '{0}/{1}'.format(*self._get_target(**kwargs))
+        #keep repos synced with index-sync up to date, without making an
+        #index for everything that's listed
+        indexed = os.path.exists(get_index_path()) and \
+            self._index.get_watermark(full_name) is not None
+        with self._output_list():
+            for page in issues:
+                page = list(page)
+                for issue in page:
+                    self._output_record(issue,
+                        '#{issue.number:0>4} ({issue.state}) @{issue.user.login: <16} -- {issue.title}',
+                        issue=issue)
+                if indexed:
+                    self._index.add_issues(full_name, page)
+                    for issue in page:
+                        self._index.update_search(full_name, issue.number)
+        if indexed:
+            self._index.commit()
+
+    @ArgFunc.auto_define_args
+    def issues_search(self, query, limit=20, all_repos=False, **kwargs):
+        """Search the titles, bodies and comments of indexed issues
+
+        Issues get indexed by index-sync, as issues-show fetches them, and as
+        issues-list fetches them from synced repos. The query uses SQLite full
+        text search syntax.
+        """
+        import sqlite3
+
+        (user, repo) = self._get_target(**kwargs)
+        if all_repos or repo is None:
+            full_name = None
+        else:
+            full_name = '{0}/{1}'.format(user, repo)
+        found = False
+        try:
+            with self._output_list():
+                for issue in self._index.search(query, full_name, int(limit)):
+                    found = True
+                    self._output_record(as_record(issue),
+                        '#{number:0>4} ({state}) {repo} -- {title}\n        {excerpt}',
+                        excerpt=' '.join(issue['snippet'].split()), **dict(issue))
+        except sqlite3.OperationalError as e:
+            if 'MATCH' not in str(e):
+                raise
+            self._output('Invalid search query: {0} (see the SQLite full ' \
+                'text search syntax)', query)
+            return 1
+        if not found:
+            self._output('No indexed issues match "{0}", try index-sync to ' \
+                'index more of them', query)
 
     @ArgFunc.auto_define_args
     def issues_create(self, title=None, body=None, assignee=None, milestone=None,
@@ -478,7 +2493,8 @@ class GithubActor(object):
                 handle.write('# Put the body of your issue here\n' \
                     '# Lines starting with \'#\' are ignored\n' \
                     '# If you didn\'t provide a title, the first line here will be used\n')
-            subprocess.call([self._get_editor(), path])
+            with tracer.span('editor', self._get_editor()):
+                subprocess.call([self._get_editor(), path])
             with open(path, 'r') as handle:
                 body = [line.rstrip() for line in handle.readlines() \
                     if not line.startswith('#') and line.strip()]
@@ -491,8 +2507,8 @@ class GithubActor(object):
         issue = self._github.issues.create(data,
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name))
-        self._output('Issue #{issue.number:0>4} created: {issue.html_url}',
-            issue=issue)
+        self._output_record(issue,
+            'Issue #{issue.number:0>4} created: {issue.html_url}', issue=issue)
 
     def _get_editor(self):
         """Get the editor from env variables
@@ -513,7 +2529,8 @@ class GithubActor(object):
             with open(path, 'w') as handle:
                 handle.write('# Write your comment here\n' \
                     '# Lines starting with \'#\' are ignored\n')
-            subprocess.call([self._get_editor(), path])
+            with tracer.span('editor', self._get_editor()):
+                subprocess.call([self._get_editor(), path])
             with open(path, 'r') as handle:
                 message = '\n'.join(line.rstrip() for line in handle.readlines() \
                     if not line.startswith('#') and line.strip())
@@ -521,18 +2538,423 @@ class GithubActor(object):
         comment = self._github.issues.comments.create(issue_number, message,
             user=kwargs.get('user', self._current_user),
             repo=kwargs.get('repo', self._current_repo_name))
-        self._output('Comment {comment.id} added!', comment=comment)
+        self._output_record(comment, 'Comment {comment.id} added!',
+            comment=comment)
         if close:
             self._github.issues.update(issue_number, {'state': 'closed'},
                 user=kwargs.get('user', self._current_user),
                 repo=kwargs.get('repo', self._current_repo_name))
             self._output('Issue closed')
 
-def build_parser(actor):
+    @ArgFunc.define_args(
+        repos={'nargs': '*', 'metavar': 'repo',
+            'help': 'Repos to include, as user/repo or just repo for your own (default: all of your or --org\'s repos)'},
+        org={'default': None,
+            'help': 'Include an organization\'s repos instead of a user\'s'},
+        repo_type={'choices': ('all', 'owner', 'public', 'private', 'member'), 'default': 'all'},
+        state={'choices': ('open', 'closed', 'all'), 'default': 'open'},
+        workers={'type': int, 'default': DEFAULT_WORKERS,
+            'help': 'Number of repos to query at once'},
+        limit={'type': int, 'default': 50,
+            'help': 'Show this many of the most recently updated, 0 for all'},
+        cached={'action': 'store_true', 'default': False,
+            'help': 'Build it from the local index instead of GitHub'},
+    )
+    def dashboard(self, repos=None, org=None, repo_type='all', state='open',
+            workers=DEFAULT_WORKERS, limit=50, cached=False, **kwargs):
+        """Show the most recently updated issues and PRs across many repos
+        """
+        import heapq
+        from pygithub3.exceptions import NotFound
+
+        user = kwargs.get('user') or self._current_user
+        if repos:
+            names = [name if '/' in name else '{0}/{1}'.format(user, name)
+                for name in repos]
+        else:
+            names = [gh_repo.full_name for gh_repo in self._list_repos(org,
+                repo_type, user=user)]
+        names = sorted(set(names), key=names.index)
+        #set up the client here rather than racing to in each worker
+        service = self._github.issues
+
+        def fetch(full_name):
+            (owner, name) = full_name.split('/', 1)
+            #the issues API includes PRs, so one (paged) request covers both,
+            #and sorting by update means no repo needs more than :limit:
+            request = service.make_request('issues.list_by_repo', user=owner,
+                repo=name)
+            params = {'state': state, 'sort': 'updated', 'direction': 'desc'}
+            if limit:
+                params['per_page'] = min(limit, 100)
+            try:
+                pages = iter_pages(self._list_rows(service, request, IssueRow,
+                    **params), limit or None)
+                found = []
+                for page in pages:
+                    for issue in page:
+                        if self._format != 'text':
+                            issue.update(repo=full_name, is_pull=bool(
+                                get_field(issue.get('pull_request'),
+                                    'html_url')))
+                        found.append((get_field(issue, 'updated_at'),
+                            full_name, issue))
+                return (full_name, found)
+            except NotFound:
+                return (full_name, None)
+
+        def get_latest(items):
+            #only hold on to what could still make the cut, ties broken by
+            #repo so the same ones always do
+            if limit:
+                return heapq.nlargest(limit, items, key=lambda item: item[:2])
+            return sorted(items, key=lambda item: item[:2], reverse=True)
+
+        items = []
+        if cached:
+            as_row = IssueRow.from_index if self._format == 'text' else \
+                as_record
+            for full_name in names:
+                if self._index.get_watermark(full_name) is None:
+                    self._output('Skipped {0}, it hasn\'t been indexed yet, ' \
+                        'run index-sync first', full_name)
+                    continue
+                rows = self._index.list_issues(full_name, state=state,
+                    sort='updated')
+                items = get_latest(items + [(row['updated_at'], full_name,
+                    as_row(row)) for row in (rows.fetchmany(limit) if limit
+                        else rows.fetchall())])
+        else:
+            for (full_name, found) in imap_pool(fetch, names, workers,
+                    ordered=False):
+                if found is None:
+                    self._output('Skipped {0}, it doesn\'t exist or you ' \
+                        'can\'t see it', full_name)
+                    continue
+                items = get_latest(items + found)
+
+        repo_padding = user_padding = 0
+        if self._format == 'text':
+            repo_padding = self._get_padding(lambda item: item[1], items)
+            user_padding = self._get_padding(lambda item: item[2].user, items)
+        with self._output_list():
+            for (updated_at, full_name, issue) in items:
+                self._output_record(issue,
+                    '{updated} {repo: <{repo_padding}} #{issue.number:0>4} {kind: <5} @{issue.user: <{user_padding}} -- {issue.title}',
+                    updated=updated_at[:16].replace('T', ' '), repo=full_name,
+                    kind='PR' if get_field(issue, 'is_pull') else 'issue',
+                    repo_padding=repo_padding, user_padding=user_padding,
+                    issue=issue)
+        if not items and self._format == 'text':
+            self._output('No {0} issues or pull requests in {1} repo(s)',
+                state, len(names))
+
+    @ArgFunc.define_args(
+        file={'default': '-',
+            'help': 'File to read the commands from, - for stdin'},
+        jobs={'type': int, 'default': 1,
+            'help': 'Number of commands to run at once'},
+    )
+    def batch(self, file='-', jobs=1, **kwargs):
+        """Run commands read one per line, all in this process
+
+        Lines are parsed like git-hub's arguments (global options come from
+        the batch command itself), blank lines and lines starting with #
+        are skipped. Commands run concurrently with --jobs so they should
+        be independent, but each one's output is reported in order.
+        """
+        import shlex
+        from StringIO import StringIO
+
+        parser = build_parser(load_command_table(self.__class__))
+        handle = sys.stdin if file == '-' else open(file)
+        lines = ((number, line.strip())
+            for (number, line) in enumerate(handle, 1)
+            if line.strip() and not line.strip().startswith('#'))
+        if jobs > 1:
+            #set up the lazy properties now, they aren't thread safe
+            self._github
+
+        def run(item):
+            (number, line) = item
+            (stdout, stderr) = (StringIO(), StringIO())
+            sys.stdout.redirect(stdout)
+            sys.stderr.redirect(stderr)
+            #with one job this runs on batch's own thread, and the command's
+            #records go to its captured output rather than batch's list
+            listed = getattr(self._local, 'listed', None)
+            self._local.listed = None
+            start = time.time()
+            try:
+                argv = shlex.split(line)
+                result = parser.parse_args(argv)
+                if result.command == 'batch':
+                    raise ValueError('batch can\'t run batch')
+                dispatch(self, result)
+                status = 0
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                print >>sys.stderr, '{0}: {1}'.format(e.__class__.__name__, e)
+                status = 1
+            finally:
+                self._local.listed = listed
+                sys.stdout.redirect(None)
+                sys.stderr.redirect(None)
+            return (number, line, status, time.time() - start,
+                stdout.getvalue(), stderr.getvalue())
+
+        (sys.stdout, sys.stderr) = (ThreadLocalStream(sys.stdout),
+            ThreadLocalStream(sys.stderr))
+        start = time.time()
+        counts = {'succeeded': 0, 'failed': 0}
+        try:
+            with self._output_list():
+                for (number, line, status, elapsed, stdout, stderr) in \
+                        imap_pool(run, lines, jobs):
+                    counts['failed' if status else 'succeeded'] += 1
+                    if self._format == 'text':
+                        self._output('[{0}] {1} -- {2} in {3:.2f}s', number,
+                            line, 'exit {0}'.format(status) if status else 'ok',
+                            elapsed)
+                        sys.stdout.write(stdout)
+                        sys.stderr.write(stderr)
+                    else:
+                        self._output_record({'line': number, 'command': line,
+                            'exit_status': status, 'seconds': round(elapsed, 3),
+                            'output': self._load_output(stdout),
+                            'errors': stderr})
+        finally:
+            (sys.stdout, sys.stderr) = (sys.stdout.default, sys.stderr.default)
+            if handle is not sys.stdin:
+                handle.close()
+        self._output('Ran {total} command(s) in {elapsed:.1f}s: {succeeded} ' \
+            'succeeded, {failed} failed', total=sum(counts.values()),
+            elapsed=time.time() - start, **counts)
+        return 1 if counts['failed'] else 0
+
+    def _load_output(self, data):
+        """Parse the records a command wrote in the json formats
+        """
+        try:
+            if self._format == 'ndjson':
+                return [json.loads(line) for line in data.splitlines()]
+            return json.loads(data) if data.strip() else None
+        except ValueError:
+            return data
+
+    @ArgFunc.define_args(
+        idle_timeout={'type': int, 'default': IDLE_TIMEOUT,
+            'help': 'Seconds without a request before the daemon exits'},
+        foreground={'action': 'store_true', 'default': False,
+            'help': 'Run the daemon here instead of in the background'},
+    )
+    def daemon_start(self, idle_timeout=IDLE_TIMEOUT, foreground=False,
+            **kwargs):
+        """Start a daemon to run list, show and search commands warm
+
+        While it's running git-hub hands those commands to it over a Unix
+        socket instead of running them itself. Set SPOKE_NO_DAEMON to skip it.
+        """
+        status = request_daemon({'control': 'status'})
+        if status is not None:
+            self._output('The daemon is already running (pid {pid})', **status)
+            return
+        if foreground:
+            Daemon(get_daemon_socket(), int(idle_timeout)).serve()
+            return
+        with open(os.devnull, 'r+') as devnull:
+            with open(os.path.join(get_cache_dir(), 'daemon.log'), 'a') as log:
+                subprocess.Popen([sys.executable, get_source_path(),
+                    'daemon-start', '--foreground',
+                    '--idle-timeout', str(idle_timeout)],
+                    stdin=devnull, stdout=log, stderr=log, close_fds=True,
+                    preexec_fn=os.setsid)
+        deadline = time.time() + 10
+        while status is None and time.time() < deadline:
+            time.sleep(0.05)
+            status = request_daemon({'control': 'status'})
+        if status is None:
+            raise ValueError('The daemon didn\'t start, see {0}'.format(
+                os.path.join(get_cache_dir(), 'daemon.log')))
+        self._output('Daemon started (pid {pid}), it will exit after ' \
+            '{idle_timeout}s without requests', **status)
+
+    @ArgFunc.define_args()
+    def daemon_stop(self, **kwargs):
+        """Stop the daemon
+        """
+        if request_daemon({'control': 'stop'}) is None:
+            self._output('The daemon isn\'t running')
+        else:
+            self._output('Daemon stopped')
+
+    @ArgFunc.define_args()
+    def daemon_status(self, **kwargs):
+        """Show whether the daemon is running and what it's been doing
+        """
+        status = request_daemon({'control': 'status'})
+        if status is None:
+            self._output('The daemon isn\'t running')
+        else:
+            self._output_record(status, 'Daemon running (pid {pid}) for ' \
+                '{uptime:.0f}s: {requests} request(s) from {actors} ' \
+                'working dir(s), exits after {idle_timeout}s idle', **status)
+
+    @ArgFunc.define_args(
+        shell={'choices': ('bash', 'zsh'),
+            'help': 'Shell to print the script for'},
+    )
+    def completion(self, shell, **kwargs):
+        """Print a shell completion script
+
+        Source it from your .bashrc, or your .zshrc after compinit.
+        """
+        import pipes
+
+        cache_dir = get_cache_dir('completion')
+        write_completion_table(os.path.join(cache_dir, 'commands'),
+            type(self))
+        #the real spoke.py (not a git-hub symlink to it) run by this python,
+        #so the refreshes don't depend on $PATH in whatever shell sources this
+        source = get_source_path()
+        if not os.path.isfile(source):
+            raise ValueError('Can\'t find spoke.py at {0}'.format(source))
+        self._output('{0}', COMPLETION_SCRIPTS[shell] % {
+            'cache_dir': pipes.quote(cache_dir),
+            'source': pipes.quote(source),
+            'program': ' '.join(pipes.quote(arg)
+                for arg in (sys.executable, source)),
+            'ttl': COMPLETION_TTL,
+        })
+
+    @ArgFunc.define_args()
+    def completion_refresh(self, **kwargs):
+        """Update the values cached for shell completion
+
+        That's the commands, a user's repo names and a repo's issue and PR
+        numbers. Completion runs this in the background as needed.
+        """
+        from pygithub3.exceptions import NotFound
+
+        cache_dir = get_cache_dir('completion')
+        write_completion_table(os.path.join(cache_dir, 'commands'),
+            type(self))
+        (user, repo) = self._get_target(**kwargs)
+        write_lines(os.path.join(cache_dir, 'user'), [self._current_user])
+
+        service = self._github.repos
+        request = service.request_builder('repos.list', user=user)
+        request.resource = RecordLoader(RepoRow)
+        write_lines(os.path.join(cache_dir, 'repos.' + user), sorted(
+            gh_repo.name for page in iter_pages(service._get_result(request,
+                type='all')) for gh_repo in page))
+
+        if repo is None:
+            return
+        service = self._github.issues
+        request = service.make_request('issues.list_by_repo', user=user,
+            repo=repo)
+        request.resource = RecordLoader(IssueRow)
+        try:
+            numbers = ['{0} {1}'.format(issue.number,
+                    'pr' if issue.is_pull else 'issue')
+                for page in iter_pages(service._get_result(request,
+                    state='open', sort='updated', direction='desc',
+                    per_page=100), COMPLETION_LIMIT)
+                for issue in page]
+        except NotFound:
+            numbers = []
+        write_lines(os.path.join(cache_dir, 'numbers.{0}.{1}'.format(user,
+            repo)), numbers)
+
+COMMAND_TABLE_VERSION = 1
+ARG_TYPES = dict((t.__name__, t) for t in (int, float, str))
+
+def build_command_table(actor_cls):
+    """Introspect :actor_cls: for its commands: the public methods with ArgFunc
+    args defined on them
+
+    The table is plain data so it can be cached, see load_command_table()
+    """
+    commands = []
+    for method in sorted(dir(actor_cls)):
+        func = getattr(actor_cls, method)
+        if method.startswith('_') or not callable(func) or \
+                not hasattr(func, '_argfunc_attrs'):
+            continue
+        args = []
+        for (arg, attrs) in sorted(ArgFunc.get_attrs(func).iteritems()):
+            attrs = attrs.copy()
+            if 'type' in attrs:
+                attrs['type'] = attrs['type'].__name__
+            args.append([arg, attrs])
+        try:
+            help_text = func.__doc__.split('\n')[0].strip()
+        except AttributeError:
+            help_text = None
+        commands.append({
+            'name': method.replace('_', '-'),
+            'method': method,
+            'help': help_text,
+            'args': args,
+        })
+    return commands
+
+def get_source_path():
+    """Get the path to this file, even if it was loaded from a .pyc or run
+    through a symlink (like git-hub)
+    """
+    path = os.path.realpath(__file__)
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return path
+
+def load_command_table(actor_cls, path=None):
+    """Get the command table for :actor_cls:, reusing the cached copy if it was
+    built from the current version of this file
+    """
+    if path is None:
+        path = os.path.join(get_cache_dir(), 'commands.json')
+    source = get_source_path()
+    try:
+        stamp = [COMMAND_TABLE_VERSION, source, os.path.getmtime(source)]
+    except OSError:
+        stamp = None
+    try:
+        with open(path, 'r') as handle:
+            cached = json.load(handle)
+        if stamp is not None and cached['stamp'] == stamp:
+            return cached['commands']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+    commands = build_command_table(actor_cls)
+    if stamp is not None:
+        try:
+            (fd, tmp_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as handle:
+                json.dump({'stamp': stamp, 'commands': commands}, handle)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass
+    return commands
+
+def build_parser(commands):
     af = ArgFunc()
     parser = argparse.ArgumentParser(description='git-hub - Do stuff with GitHub',
         prog='git-hub')
     parser.add_argument('--verbose', help='Display more output', action='store_true')
+    parser.add_argument('--no-cache', help='Don\'t use cached API responses',
+        action='store_true')
+    parser.add_argument('--stats', help='Summarize the API requests made',
+        action='store_true')
+    parser.add_argument('--format', help='Output results as text, as JSON ' \
+        'or as one JSON record per line', choices=GithubActor.OUTPUT_FORMATS,
+        default='text')
+    parser.add_argument('--profile', help='Summarize where the time went',
+        action='store_true')
+    parser.add_argument('--trace', help='Write a trace of the API requests, ' \
+        'git commands etc. made to this file', metavar='FILE')
     command_parsers = parser.add_subparsers(title='GitHub commands',
         dest='command')
 
@@ -540,38 +2962,497 @@ def build_parser(actor):
     parent_parser.add_argument('-u', '--user', help='Override target username')
     parent_parser.add_argument('-r', '--repo', help='Override target repo name')
 
-    #oh god wat
-    command_verbs = dict((c, [v.split('_', 1)[1] for v in dir(actor) \
-            if v.startswith(c+'_') and callable(getattr(actor, v))]) \
-        for c in set(c.split('_')[0] for c in dir(actor) \
-            if not c.startswith('_') and callable(getattr(actor, c))))
-
-    for command in command_verbs:
-        for verb in command_verbs[command]:
-            command_verb = command + '_' + verb
-            cv_func = getattr(actor, command_verb)
-            attrs = {'parents': [parent_parser]}
-            try:
-                attrs['help'] = cv_func.__doc__.split('\n')[0].strip()
-            except AttributeError:
-                pass
-            verb_parser = command_parsers.add_parser(
-                command_verb.replace('_', '-'), **attrs)
-            af.add_func(verb_parser, cv_func)
-    develop_parser = command_parsers.add_parser('develop',
-        help=actor.develop.__doc__.split('\n')[0].strip(),
-        parents=[parent_parser])
-    af.add_func(develop_parser, actor.develop)
+    for command in commands:
+        attrs = {'parents': [parent_parser]}
+        if command['help']:
+            attrs['help'] = command['help']
+        verb_parser = command_parsers.add_parser(command['name'], **attrs)
+        af.add_args(verb_parser, ((arg, dict(arg_attrs,
+                type=ARG_TYPES[arg_attrs['type']])
+                if 'type' in arg_attrs else arg_attrs)
+            for (arg, arg_attrs) in command['args']))
     return parser
 
+#minutes before shell completion refreshes the repos and issue numbers it
+#offers, in the background
+COMPLETION_TTL = 5
+#how many of a repo's (most recently updated) open issues and PRs it offers
+COMPLETION_LIMIT = 500
+#what to complete the values of args with these dests with, from the files
+#written by the completion-refresh command
+COMPLETION_VALUES = {
+    'repo': '@repo',
+    'repos': '@repo',
+    'issue_number': '@issue',
+    'pr_number': '@pr',
+    'pr_numbers': '@pr',
+}
+
+def write_lines(path, lines):
+    """Replace the file at :path: with :lines:, atomically so readers (like the
+    completion scripts) never see it half written
+    """
+    (fd, tmp_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as handle:
+        for line in lines:
+            handle.write(line.encode('utf-8') + '\n')
+    os.rename(tmp_path, path)
+
+def get_completion_tokens(parser):
+    """Describe :parser:'s args for the completion scripts: each option, with
+    "=" and what to complete its value with if it takes one, then ":" and what
+    to complete each positional arg with
+
+    Values are completed with choices separated by "|", or with @repo, @issue
+    or @pr for the names and numbers from the completion cache.
+    """
+    tokens = []
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            continue
+        if action.choices:
+            values = '|'.join(str(choice) for choice in action.choices)
+        else:
+            values = COMPLETION_VALUES.get(action.dest, '')
+        if not action.option_strings:
+            tokens.append(':' + values)
+        for option in action.option_strings:
+            tokens.append(option if action.nargs == 0 else
+                '{0}={1}'.format(option, values))
+    return tokens
+
+def write_completion_table(path, actor_cls):
+    """Write the table of commands the completion scripts read, a line for each
+    with its name and get_completion_tokens(), and one named "-" for the
+    global options
+    """
+    parser = build_parser(load_command_table(actor_cls))
+    lines = [' '.join(['-'] + get_completion_tokens(parser))]
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            lines.extend(' '.join([name] + get_completion_tokens(subparser))
+                for (name, subparser) in sorted(action.choices.items()))
+    write_lines(path, lines)
+
+#plain shell rather than a call back into spoke, which takes longer to start
+#than a Tab press should; it only reads the files in the completion cache and
+#runs completion-refresh in the background when they're missing or stale
+COMPLETION_FUNCTIONS = r"""#completion for git hub, from "git hub completion"
+__spoke_dir=%(cache_dir)s
+__spoke_source=%(source)s
+
+__spoke() {
+    %(program)s "$@"
+}
+
+__spoke_refresh() {
+    #refresh the cache in the background if $1 is missing or stale, touching it
+    #first so the Tabs before the refresh is done don't start more of them
+    local file=$1
+    shift
+    if [ -e "$file" ] && [ ! "$__spoke_source" -nt "$file" ] &&
+            [ -z "$(find "$file" -mmin +%(ttl)d 2>/dev/null)" ]; then
+        return
+    fi
+    touch "$file" 2>/dev/null
+    (__spoke completion-refresh "$@" </dev/null >/dev/null 2>&1 &)
+}
+
+__spoke_lookup() {
+    #set __spoke_line to the options and args of command $1
+    local name rest
+    __spoke_line=
+    while read -r name rest; do
+        if [ "$name" = "$1" ]; then
+            __spoke_line=$rest
+            return 0
+        fi
+    done 2>/dev/null <"$__spoke_dir/commands"
+    return 1
+}
+
+__spoke_candidates() {
+    #print what $1 could be completed to, after the git hub args in the rest of
+    #the args
+    [ -n "$ZSH_VERSION" ] && setopt localoptions shwordsplit
+    local cur=$1 command= option= user= repo= positional=0 want= word token
+    shift
+    __spoke_refresh "$__spoke_dir/commands"
+    __spoke_lookup - || return
+    for word in "$@"; do
+        if [ -n "$option" ]; then
+            case $option in
+                -u|--user) user=$word ;;
+                -r|--repo) repo=$word ;;
+            esac
+            option=
+        elif [ "${word#-}" != "$word" ]; then
+            for token in $__spoke_line; do
+                case $token in
+                    "$word"=*) option=$word ;;
+                esac
+            done
+        elif [ -z "$command" ]; then
+            command=$word
+            __spoke_lookup "$command" || return
+        else
+            positional=$((positional + 1))
+        fi
+    done
+
+    if [ -n "$option" ]; then
+        for token in $__spoke_line; do
+            case $token in
+                "$option"=*) want=${token#*=} ;;
+            esac
+        done
+    elif [ "${cur#-}" != "$cur" ]; then
+        for token in $__spoke_line; do
+            case $token in
+                -*) printf '%%s\n' "${token%%%%=*}" ;;
+            esac
+        done
+        return
+    elif [ -z "$command" ]; then
+        while read -r word token; do
+            [ "$word" = - ] || printf '%%s\n' "$word"
+        done 2>/dev/null <"$__spoke_dir/commands"
+        return
+    else
+        #past the last positional arg the last one repeats, for nargs="*"
+        for token in $__spoke_line; do
+            case $token in
+                :*)
+                    want=${token#:}
+                    [ $positional -eq 0 ] && break
+                    positional=$((positional - 1)) ;;
+            esac
+        done
+    fi
+
+    case $want in
+        '') ;;
+        @*)
+            if [ -z "$user" ]; then
+                __spoke_refresh "$__spoke_dir/user"
+                read -r user 2>/dev/null <"$__spoke_dir/user"
+                [ -n "$user" ] || return
+            fi
+            if [ "$want" = @repo ]; then
+                __spoke_refresh "$__spoke_dir/repos.$user" -u "$user"
+                while read -r word; do
+                    printf '%%s\n' "$word"
+                done 2>/dev/null <"$__spoke_dir/repos.$user"
+                return
+            fi
+            if [ -z "$repo" ]; then
+                repo=$(git rev-parse --show-toplevel 2>/dev/null)
+                repo=${repo##*/}
+                [ -n "$repo" ] || return
+            fi
+            __spoke_refresh "$__spoke_dir/numbers.$user.$repo" -u "$user" \
+                -r "$repo"
+            while read -r word token; do
+                [ "@$token" = "$want" ] && printf '%%s\n' "$word"
+            done 2>/dev/null <"$__spoke_dir/numbers.$user.$repo" ;;
+        *)
+            local IFS='|'
+            for token in $want; do
+                printf '%%s\n' "$token"
+            done ;;
+    esac
+}
+"""
+
+COMPLETION_SCRIPTS = {
+    'bash': COMPLETION_FUNCTIONS + r"""
+_git_hub() {
+    #git's completion calls this for "git hub", and it's set for git-hub below
+    local i=0 cur=${COMP_WORDS[COMP_CWORD]} candidates
+    while [ $i -lt $COMP_CWORD ]; do
+        case ${COMP_WORDS[i]} in
+            hub|*git-hub) break ;;
+        esac
+        i=$((i + 1))
+    done
+    i=$((i + 1))
+    [ $i -le $COMP_CWORD ] || return
+    candidates=$(__spoke_candidates "$cur" "${COMP_WORDS[@]:i:COMP_CWORD-i}")
+    local IFS=$'\n'
+    COMPREPLY=($(compgen -W "$candidates" -- "$cur"))
+}
+
+complete -o default -F _git_hub git-hub
+""",
+    'zsh': COMPLETION_FUNCTIONS + r"""
+_git-hub() {
+    #zsh's git completion calls this for "git hub", with words starting at hub
+    local -a candidates
+    candidates=(${(f)"$(__spoke_candidates "${words[CURRENT]}" \
+        "${(@)words[2,CURRENT-1]}")"})
+    compadd -a candidates
+}
+
+compdef _git-hub git-hub
+""",
+}
+
+def dispatch(actor, result):
+    """Run the command parsed into :result: on :actor:
+    """
+    kwargs = vars(result).copy()
+    for option in ('no_cache', 'stats', 'format', 'profile', 'trace'):
+        del kwargs[option]
+    command_verb = kwargs.pop('command').replace('-', '_')
+    return getattr(actor, command_verb)(**kwargs)
+
+DAEMON_COMMANDS = ('issues-list', 'issues-search', 'issues-show', 'pr-list',
+    'pr-show', 'repos-list', 'repos-show')
+
+def get_daemon_socket():
+    return os.path.join(get_cache_dir(), 'daemon.sock')
+
+def request_daemon(request, path=None):
+    """Send :request: to the daemon, returning its first reply or None if it
+    isn't running
+    """
+    import socket
+    if path is None:
+        path = get_daemon_socket()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(request) + '\n')
+        return json.loads(sock.makefile('rb').readline() or 'null')
+    except (socket.error, ValueError):
+        return None
+    finally:
+        sock.close()
+
+def run_in_daemon(argv):
+    """Run the command in :argv: in the daemon, returning its exit status, or
+    None if it should be run here instead
+    """
+    import socket
+    if os.environ.get('SPOKE_NO_DAEMON'):
+        return None
+    command = None
+    args = iter(argv)
+    for arg in args:
+        if arg == '--format':
+            next(args, None)
+        elif arg.startswith(('--stats', '--profile', '--trace')):
+            #these measure this process
+            return None
+        elif not arg.startswith('-'):
+            command = arg
+            break
+    path = get_daemon_socket()
+    if command not in DAEMON_COMMANDS or not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX)
+    replied = False
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd(),
+            'console_size': read_console_size(),
+            'source_mtime': os.path.getmtime(get_source_path())}) + '\n')
+        for line in sock.makefile('rb'):
+            reply = json.loads(line)
+            replied = True
+            if 'stale' in reply:
+                return None
+            elif 'exit' in reply:
+                return reply['exit']
+            for (name, stream) in (('stdout', sys.stdout),
+                    ('stderr', sys.stderr)):
+                if name in reply:
+                    stream.write(reply[name].encode('utf-8'))
+                    stream.flush()
+    except (socket.error, OSError):
+        #can't reach the daemon or stat this file, run it here instead
+        if not replied:
+            return None
+    finally:
+        sock.close()
+    print >>sys.stderr, 'The daemon went away while running the command'
+    return 1
+
+class DaemonStream(object):
+    """File-like object that sends what's written to it to a daemon client
+    """
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+
+    def write(self, data):
+        if data:
+            self.sock.sendall(json.dumps({self.name: data}) + '\n')
+
+    def flush(self):
+        pass
+
+class Daemon(object):
+    """Runs commands for git-hub processes that connect to its Unix socket at
+    :path:, with a warm GithubActor for each working dir, until nothing has
+    connected for :idle_timeout: seconds
+    """
+
+    def __init__(self, path, idle_timeout=GithubActor.IDLE_TIMEOUT):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.source_mtime = os.path.getmtime(get_source_path())
+        self.started = time.time()
+        self.requests = 0
+        self._parser = build_parser(load_command_table(GithubActor))
+        self._actors = {}
+        self._active = 0
+        self._last_request = time.time()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def serve(self):
+        import socket
+        #warm up the slow imports, GitPython also complains if it's first
+        #imported outside the main thread
+        import git
+        import pygithub3
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        listener = socket.socket(socket.AF_UNIX)
+        #the actors hold credentials, only we get to talk to them
+        umask = os.umask(0177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen(16)
+        listener.settimeout(1)
+        (sys.stdout, sys.stderr) = (ThreadLocalStream(sys.stdout),
+            ThreadLocalStream(sys.stderr))
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    (conn, _) = listener.accept()
+                except socket.timeout:
+                    with self._lock:
+                        if not self._active and time.time() - \
+                                self._last_request > self.idle_timeout:
+                            break
+                    continue
+                with self._lock:
+                    self._active += 1
+                thread = threading.Thread(target=self.handle, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        finally:
+            listener.close()
+            os.unlink(self.path)
+
+    def handle(self, conn):
+        conn.settimeout(None)
+        try:
+            request = json.loads(conn.makefile('rb').readline() or '{}')
+            if 'control' in request:
+                if request['control'] == 'stop':
+                    self._running = False
+                reply = self.status()
+            elif request.get('source_mtime') != self.source_mtime:
+                #spoke has been updated since we started
+                self._running = False
+                reply = {'stale': True}
+            else:
+                reply = {'exit': self.run(request, DaemonStream(conn, 'stdout'),
+                    DaemonStream(conn, 'stderr'))}
+            conn.sendall(json.dumps(reply) + '\n')
+        except Exception:
+            import traceback
+            traceback.print_exc(file=sys.__stderr__)
+        finally:
+            conn.close()
+            with self._lock:
+                self._active -= 1
+                self._last_request = time.time()
+
+    def run(self, request, stdout, stderr):
+        """Run the command in :request:, sending its output to :stdout: and
+        :stderr:, and return its exit status
+        """
+        import traceback
+        _console.size = request.get('console_size')
+        sys.stdout.redirect(stdout)
+        sys.stderr.redirect(stderr)
+        try:
+            result = self._parser.parse_args(request['argv'])
+            return dispatch(self.get_actor(request['cwd'], result),
+                result) or 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdout.redirect(None)
+            sys.stderr.redirect(None)
+            _console.size = None
+            with self._lock:
+                self.requests += 1
+
+    def get_actor(self, cwd, result):
+        key = (cwd, result.no_cache, result.format)
+        with self._lock:
+            actor = self._actors.get(key)
+            if actor is None:
+                actor = GithubActor(use_cache=not result.no_cache,
+                    output_format=result.format, cwd=cwd)
+                #set up the lazy properties now, they aren't thread safe
+                actor._github
+                self._actors[key] = actor
+        return actor
+
+    def status(self):
+        return {'pid': os.getpid(), 'uptime': time.time() - self.started,
+            'requests': self.requests, 'idle_timeout': self.idle_timeout,
+            'actors': len(set(cwd for (cwd, _, _) in self._actors))}
+
 def main():
-    actor = GithubActor()
-    parser = build_parser(actor)
+    status = run_in_daemon(sys.argv[1:])
+    if status is not None:
+        return status
+    parser = build_parser(load_command_table(GithubActor))
     result = parser.parse_args()
-    command_verb = result.command.replace('-', '_')
-    del result.command
-    action = getattr(actor, command_verb)
-    return action(**vars(result))
+    actor = GithubActor(use_cache=not result.no_cache,
+        output_format=result.format)
+    if result.profile or result.trace:
+        tracer.enable()
+    try:
+        with tracer.span('command', result.command):
+            return dispatch(actor, result)
+    finally:
+        if result.stats:
+            actor._output_stats()
+        if result.profile:
+            sys.stderr.write(tracer.format_summary() + '\n')
+        if result.trace:
+            tracer.write_trace(result.trace)
+
+def exit_on_epipe(func):
+    """Run :func:, exiting quietly like other commands do when whatever
+    stdout is piped to (like head) stops reading
+    """
+    import errno
+    try:
+        return func()
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        #don't let the interpreter trip over stdout again on the way out
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 128 + 13
 
 if __name__ == '__main__':
-    main()
+    sys.exit(exit_on_epipe(main))